@@ -2,8 +2,18 @@
 
 from __future__ import annotations
 
-from fastapi import FastAPI, Query
+import asyncio
+import functools
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+import orjson
+import pyarrow as pa
+from fastapi import FastAPI, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from api import queries
 from api.models import (
@@ -23,10 +33,28 @@ from api.models import (
     YearlySummary,
 )
 
+# Default-argument calls every dashboard page load starts with
+_WARM_QUERIES: list[tuple[Callable, tuple]] = [
+    (queries.get_filter_options, ()),
+    (queries.get_overview, (2021, 2025, None)),
+    (queries.get_trends, (2021, 2025, None, None)),
+]
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Serialize the popular default responses into the cache before serving
+    for fn, args in _WARM_QUERIES:
+        await asyncio.to_thread(_cached, fn, *args)
+    yield
+
+
 app = FastAPI(
     title="San Diego Public Safety API",
     description="Crime incidents, arrests, and calls for service across San Diego County",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan,
 )
 
 app.add_middleware(
@@ -35,10 +63,75 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+_CACHE_CONTROL = "public, max-age=3600"
+
+
+@app.middleware("http")
+async def _conditional_get(request: Request, call_next):
+    """Tag responses with the data version and answer repeat GETs with 304.
+
+    The 304 is decided after routing, so unknown paths and invalid params
+    still get their 404/422; only a response that would have been 200 is
+    replaced.
+    """
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200:
+        return response
+    etag = f'W/"{queries.data_version():x}"'
+    sent = {t.strip() for t in request.headers.get("if-none-match", "").split(",")}
+    if etag in sent or "*" in sent:
+        # Keep what inner middleware added (CORS, Vary) but not the body's
+        # Content-* headers, which don't describe an empty 304
+        not_modified = Response(status_code=304)
+        not_modified.raw_headers.extend(
+            (k, v) for k, v in response.raw_headers if not k.startswith(b"content-")
+        )
+        response = not_modified
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = _CACHE_CONTROL
+    # JSON and Arrow bodies share a URL; keep shared caches from mixing them
+    response.headers.append("Vary", "Accept")
+    return response
+
+
+_ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Shared query-parameter declarations; defaults stay on each endpoint since
+# crime (2021-2025) and CFS (2015-2026) ranges differ
+YearMin = Annotated[int, Query(description="Start year")]
+YearMax = Annotated[int, Query(description="End year")]
+Agency = Annotated[str | None, Query(description="Agency short name")]
+CrimeAgainst = Annotated[str | None, Query(description="Crime category")]
+Priority = Annotated[int | None, Query(description="Call priority level")]
+
+
+@functools.lru_cache(maxsize=512)
+def _cached_body(version: int, fn: Callable, *args) -> bytes:
+    return orjson.dumps(fn(*args))
+
+
+def _cached(fn: Callable, *args) -> Response:
+    """Serve fn(*args) as JSON, reusing the serialized body for repeat params."""
+    body = _cached_body(queries.data_version(), fn, *args)
+    return Response(body, media_type="application/json")
+
+
+def _wants_arrow(request: Request) -> bool:
+    return _ARROW_STREAM in request.headers.get("accept", "")
+
+
+def _arrow(table: pa.Table) -> Response:
+    """Serialize an Arrow table as an IPC stream for clients that ask for it."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=_ARROW_STREAM)
 
 
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "San Diego Public Safety API",
         "endpoints": [
@@ -50,123 +143,133 @@ def root():
     }
 
 
-@app.get("/filters", response_model=FilterOptions)
-def filters():
+@app.get("/filters", responses={200: {"model": FilterOptions}})
+async def filters():
     """Available filter values for all datasets."""
-    return queries.get_filter_options()
+    return await asyncio.to_thread(_cached, queries.get_filter_options)
 
 
-@app.get("/overview", response_model=list[YearlySummary])
-def overview(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    agency: str | None = Query(None, description="Agency short name"),
+@app.get("/overview", responses={200: {"model": list[YearlySummary]}})
+async def overview(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    agency: Agency = None,
 ):
-    return queries.get_overview(year_min, year_max, agency)
-
-
-@app.get("/trends", response_model=list[TrendPoint])
-def trends(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    agency: str | None = Query(None, description="Agency short name"),
-    crime_against: str | None = Query(None, description="Crime category"),
+    return await asyncio.to_thread(_cached, queries.get_overview, year_min, year_max, agency)
+
+
+@app.get("/trends", responses={
+    200: {"model": list[TrendPoint], "content": {_ARROW_STREAM: {}}},
+})
+async def trends(
+    request: Request,
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    agency: Agency = None,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_trends(year_min, year_max, agency, crime_against)
+    if _wants_arrow(request):
+        return _arrow(await asyncio.to_thread(queries.get_trends, year_min, year_max, agency, crime_against, arrow=True))
+    return await asyncio.to_thread(_cached, queries.get_trends, year_min, year_max, agency, crime_against)
 
 
-@app.get("/crime-types", response_model=list[CrimeType])
-def crime_types(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/crime-types", responses={200: {"model": list[CrimeType]}})
+async def crime_types(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_crime_types(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_crime_types, year_min, year_max, crime_against)
 
 
-@app.get("/geography", response_model=list[GeographyRow])
-def geography(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/geography", responses={200: {"model": list[GeographyRow]}})
+async def geography(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_geography(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_geography, year_min, year_max, crime_against)
 
 
-@app.get("/agencies", response_model=list[AgencyRow])
-def agencies(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/agencies", responses={200: {"model": list[AgencyRow]}})
+async def agencies(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_agencies(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_agencies, year_min, year_max, crime_against)
 
 
-@app.get("/victims", response_model=list[VictimRow])
-def victims(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/victims", responses={200: {"model": list[VictimRow]}})
+async def victims(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_victims(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_victims, year_min, year_max, crime_against)
 
 
-@app.get("/domestic-violence", response_model=list[DVRow])
-def domestic_violence(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    agency: str | None = Query(None, description="Agency short name"),
+@app.get("/domestic-violence", responses={200: {"model": list[DVRow]}})
+async def domestic_violence(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    agency: Agency = None,
 ):
-    return queries.get_domestic_violence(year_min, year_max, agency)
+    return await asyncio.to_thread(_cached, queries.get_domestic_violence, year_min, year_max, agency)
 
 
-@app.get("/temporal-patterns", response_model=list[TemporalRow])
-def temporal_patterns(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/temporal-patterns", responses={200: {"model": list[TemporalRow]}})
+async def temporal_patterns(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_temporal_patterns(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_temporal_patterns, year_min, year_max, crime_against)
 
 
-@app.get("/cities", response_model=list[CityRow])
-def cities(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    crime_against: str | None = Query(None, description="Crime category"),
+@app.get("/cities", responses={200: {"model": list[CityRow]}})
+async def cities(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    crime_against: CrimeAgainst = None,
 ):
-    return queries.get_cities(year_min, year_max, crime_against)
+    return await asyncio.to_thread(_cached, queries.get_cities, year_min, year_max, crime_against)
 
 
-@app.get("/arrests", response_model=list[ArrestRow])
-def arrests(
-    year_min: int = Query(2021, description="Start year"),
-    year_max: int = Query(2025, description="End year"),
-    agency: str | None = Query(None, description="Agency short name"),
+@app.get("/arrests", responses={200: {"model": list[ArrestRow]}})
+async def arrests(
+    year_min: YearMin = 2021,
+    year_max: YearMax = 2025,
+    agency: Agency = None,
 ):
-    return queries.get_arrests(year_min, year_max, agency)
+    return await asyncio.to_thread(_cached, queries.get_arrests, year_min, year_max, agency)
 
 
-@app.get("/calls-for-service", response_model=list[CFSRow])
-def calls_for_service(
-    year_min: int = Query(2015, description="Start year"),
-    year_max: int = Query(2026, description="End year"),
-    priority: int | None = Query(None, description="Call priority level"),
+@app.get("/calls-for-service", responses={200: {"model": list[CFSRow]}})
+async def calls_for_service(
+    year_min: YearMin = 2015,
+    year_max: YearMax = 2026,
+    priority: Priority = None,
 ):
-    return queries.get_calls_for_service(year_min, year_max, priority)
+    return await asyncio.to_thread(_cached, queries.get_calls_for_service, year_min, year_max, priority)
 
 
-@app.get("/calls-by-beat", response_model=list[CFSBeatRow])
-def calls_by_beat(
-    year_min: int = Query(2015, description="Start year"),
-    year_max: int = Query(2026, description="End year"),
-    priority: int | None = Query(None, description="Call priority level"),
+@app.get("/calls-by-beat", responses={
+    200: {"model": list[CFSBeatRow], "content": {_ARROW_STREAM: {}}},
+})
+async def calls_by_beat(
+    request: Request,
+    year_min: YearMin = 2015,
+    year_max: YearMax = 2026,
+    priority: Priority = None,
 ):
-    return queries.get_calls_by_beat(year_min, year_max, priority)
+    if _wants_arrow(request):
+        return _arrow(await asyncio.to_thread(queries.get_calls_by_beat, year_min, year_max, priority, arrow=True))
+    return await asyncio.to_thread(_cached, queries.get_calls_by_beat, year_min, year_max, priority)
 
 
-@app.get("/calls-temporal", response_model=list[CFSTemporalRow])
-def calls_temporal(
-    priority: int | None = Query(None, description="Call priority level"),
+@app.get("/calls-temporal", responses={200: {"model": list[CFSTemporalRow]}})
+async def calls_temporal(
+    priority: Priority = None,
 ):
-    return queries.get_calls_temporal(priority)
+    return await asyncio.to_thread(_cached, queries.get_calls_temporal, priority)
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import MAXYEAR, MINYEAR, date
 from pathlib import Path
 
 import duckdb
+import pyarrow as pa
 
 _AGG = Path(__file__).resolve().parent.parent / "data" / "aggregated"
-_PROC = Path(__file__).resolve().parent.parent / "data" / "processed"
 
 # Aggregation parquet paths
 _YEARLY_SUMMARY = _AGG / "yearly_summary.parquet"
@@ -19,19 +22,40 @@ _CRIME_BY_CITY = _AGG / "crime_by_city.parquet"
 _VICTIM_DEMO = _AGG / "victim_demographics.parquet"
 _DV = _AGG / "domestic_violence.parquet"
 _TEMPORAL = _AGG / "temporal_patterns.parquet"
-_MAP_POINTS = _AGG / "map_points.parquet"
 _ARRESTS = _AGG / "arrests_by_type.parquet"
-_CFS_MONTHLY = _AGG / "cfs_monthly.parquet"
-_CFS_BY_BEAT = _AGG / "cfs_by_beat.parquet"
 _CFS_TEMPORAL = _AGG / "cfs_temporal.parquet"
+_CFS_MONTHLY_PRIORITY = _AGG / "cfs_monthly_priority.parquet"
+_CFS_BEAT_PRIORITY = _AGG / "cfs_beat_priority.parquet"
 
+# One in-memory connection per process; each query runs on its own cursor
+# so concurrent requests from FastAPI's threadpool don't share state.
+_CON = duckdb.connect()
+_CON.execute("SET parquet_metadata_cache = true")
 
-def _run(sql: str) -> list[dict]:
-    con = duckdb.connect()
-    try:
-        return con.execute(sql).fetchdf().to_dict(orient="records")
-    finally:
-        con.close()
+# Each parquet is exposed as a view named after its file stem
+for _path in (
+    _YEARLY_SUMMARY, _CRIME_BY_TYPE, _CRIME_BY_ZIP,
+    _CRIME_BY_AGENCY, _CRIME_BY_CITY, _VICTIM_DEMO, _DV, _TEMPORAL,
+    _ARRESTS, _CFS_TEMPORAL, _CFS_MONTHLY_PRIORITY, _CFS_BEAT_PRIORITY,
+    _CRIME_MONTHLY,
+):
+    _CON.execute(f"CREATE OR REPLACE VIEW {_path.stem} AS SELECT * FROM read_parquet('{_path}')")
+
+
+def _run(sql: str, params: list | None = None, *, arrow: bool = False) -> list[dict] | pa.Table:
+    # Statements aren't PREPAREd up front: the Python client can't bind ``?``
+    # values into EXECUTE, and prepared statements only live on the cursor
+    # that created them. Binding params per call keeps one SQL text per
+    # endpoint, and planning is noise next to the parquet scan.
+    with _CON.cursor() as cur:
+        # .arrow() is a Table on DuckDB <1.5 and a RecordBatchReader after
+        table = pa.table(cur.execute(sql, params).arrow())
+    return table if arrow else table.to_pylist()
+
+
+def data_version() -> int:
+    """Newest aggregation parquet mtime; changes whenever the pipeline re-runs."""
+    return max((p.stat().st_mtime_ns for p in _AGG.glob("*.parquet")), default=0)
 
 
 def _q(where: str, condition: str) -> str:
@@ -40,6 +64,15 @@ def _q(where: str, condition: str) -> str:
     return f"{where} AND {condition}"
 
 
+def _year_start(year: int) -> date:
+    """January 1st of ``year``, clamped to the years ``date`` can hold.
+
+    Out-of-range bounds match no rows either way; clamping keeps them an
+    empty result instead of a ValueError.
+    """
+    return date(min(max(year, MINYEAR), MAXYEAR), 1, 1)
+
+
 def _where(
     year_min: int | None = None,
     year_max: int | None = None,
@@ -51,47 +84,69 @@ def _where(
     has_crime_against: bool = True,
     has_city: bool = False,
     year_col: str = "year",
-) -> str:
+    month_col: str | None = None,
+) -> tuple[str, list]:
+    """Build a WHERE clause plus the values for its ``?`` placeholders.
+
+    With ``month_col`` the year bounds become a date range on that column,
+    which parquet min/max statistics can prune (``YEAR(col)`` can't).
+    """
     w = ""
+    params: list = []
     if year_min is not None:
-        w = _q(w, f"{year_col} >= {year_min}")
+        if month_col:
+            w = _q(w, f"{month_col} >= ?")
+            params.append(_year_start(year_min))
+        else:
+            w = _q(w, f"{year_col} >= ?")
+            params.append(year_min)
     if year_max is not None:
-        w = _q(w, f"{year_col} <= {year_max}")
+        if month_col:
+            w = _q(w, f"{month_col} < ?")
+            params.append(_year_start(year_max + 1))
+        else:
+            w = _q(w, f"{year_col} <= ?")
+            params.append(year_max)
     if agency and has_agency:
-        w = _q(w, f"agency_short = '{agency.replace(chr(39), chr(39)*2)}'")
+        w = _q(w, "agency_short = ?")
+        params.append(agency)
     if crime_against and has_crime_against:
-        w = _q(w, f"crime_against = '{crime_against.replace(chr(39), chr(39)*2)}'")
+        w = _q(w, "crime_against = ?")
+        params.append(crime_against)
     if city and has_city:
-        w = _q(w, f"city = '{city.replace(chr(39), chr(39)*2)}'")
-    return w
+        w = _q(w, "city = ?")
+        params.append(city)
+    return w, params
 
 
 # ── Filter options ────────────────────────────────────────────────────
 
 def get_filter_options() -> dict:
     """Get available filter values for all datasets."""
-    con = duckdb.connect()
-    try:
-        years = [r[0] for r in con.execute(
-            f"SELECT DISTINCT year FROM '{_CRIME_BY_AGENCY}' ORDER BY year"
-        ).fetchall()]
-        agencies = [r[0] for r in con.execute(
-            f"SELECT DISTINCT agency_short FROM '{_CRIME_BY_AGENCY}' ORDER BY agency_short"
-        ).fetchall()]
-        categories = [r[0] for r in con.execute(
-            f"SELECT DISTINCT crime_against FROM '{_CRIME_BY_AGENCY}' WHERE crime_against IS NOT NULL ORDER BY crime_against"
-        ).fetchall()]
-        cities = [r[0] for r in con.execute(
-            f"SELECT DISTINCT city FROM '{_CRIME_BY_CITY}' WHERE city IS NOT NULL ORDER BY city"
-        ).fetchall()]
-        return {
-            "years": years,
-            "agencies": agencies,
-            "crime_categories": categories,
-            "cities": cities,
-        }
-    finally:
-        con.close()
+    # Keyed on parquet mtimes so a pipeline refresh invalidates the cache
+    mtime_key = (_CRIME_BY_AGENCY.stat().st_mtime_ns, _CRIME_BY_CITY.stat().st_mtime_ns)
+    return _filter_options_cached(mtime_key)
+
+
+_FILTER_SQL = {
+    "years": "SELECT DISTINCT year FROM crime_by_agency ORDER BY year",
+    "agencies": "SELECT DISTINCT agency_short FROM crime_by_agency ORDER BY agency_short",
+    "crime_categories": "SELECT DISTINCT crime_against FROM crime_by_agency WHERE crime_against IS NOT NULL ORDER BY crime_against",
+    "cities": "SELECT DISTINCT city FROM crime_by_city WHERE city IS NOT NULL ORDER BY city",
+}
+
+
+def _column(sql: str) -> list:
+    with _CON.cursor() as cur:
+        return [r[0] for r in cur.execute(sql).fetchall()]
+
+
+@functools.lru_cache(maxsize=1)
+def _filter_options_cached(mtime_key: tuple[int, int]) -> dict:
+    # The four scans are independent; each runs on its own cursor/thread
+    with ThreadPoolExecutor(max_workers=len(_FILTER_SQL)) as pool:
+        futures = {key: pool.submit(_column, sql) for key, sql in _FILTER_SQL.items()}
+    return {key: fut.result() for key, fut in futures.items()}
 
 
 # ── Overview / KPIs ──────────────────────────────────────────────────
@@ -100,8 +155,8 @@ def get_overview(
     year_min: int = 2021, year_max: int = 2025,
     agency: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, agency)
-    return _run(f"SELECT * FROM '{_YEARLY_SUMMARY}' {w} ORDER BY year")
+    w, params = _where(year_min, year_max, agency)
+    return _run(f"SELECT * FROM yearly_summary {w} ORDER BY year", params)
 
 
 # ── Crime trends ─────────────────────────────────────────────────────
@@ -109,16 +164,16 @@ def get_overview(
 def get_trends(
     year_min: int = 2021, year_max: int = 2025,
     agency: str | None = None, crime_against: str | None = None,
-) -> list[dict]:
-    # crime_overview_monthly has no "year" col — derive from month_start
-    w = _where(year_min, year_max, agency, crime_against, year_col="YEAR(month_start)")
+    *, arrow: bool = False,
+) -> list[dict] | pa.Table:
+    w, params = _where(year_min, year_max, agency, crime_against, month_col="month_start")
     return _run(f"""
         SELECT month_start, crime_against,
-               SUM(total_incidents) AS total_incidents
-        FROM '{_CRIME_MONTHLY}' {w}
+               SUM(total_incidents)::BIGINT AS total_incidents
+        FROM crime_overview_monthly {w}
         GROUP BY month_start, crime_against
         ORDER BY month_start
-    """)
+    """, params, arrow=arrow)
 
 
 # ── Crime types ──────────────────────────────────────────────────────
@@ -127,14 +182,14 @@ def get_crime_types(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
+    w, params = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
     return _run(f"""
         SELECT offense_group, offense_description, crime_against,
-               SUM(count) AS count
-        FROM '{_CRIME_BY_TYPE}' {w}
+               SUM(count)::BIGINT AS count
+        FROM crime_by_type {w}
         GROUP BY offense_group, offense_description, crime_against
         ORDER BY count DESC
-    """)
+    """, params)
 
 
 # ── Geography / ZIP ──────────────────────────────────────────────────
@@ -143,14 +198,14 @@ def get_geography(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
+    w, params = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
     return _run(f"""
         SELECT zip_code, city, crime_against,
-               SUM(count) AS count
-        FROM '{_CRIME_BY_ZIP}' {w}
+               SUM(count)::BIGINT AS count
+        FROM crime_by_zip {w}
         GROUP BY zip_code, city, crime_against
         ORDER BY count DESC
-    """)
+    """, params)
 
 
 # ── Agencies ─────────────────────────────────────────────────────────
@@ -159,14 +214,14 @@ def get_agencies(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against)
+    w, params = _where(year_min, year_max, crime_against=crime_against)
     return _run(f"""
         SELECT agency_short, crime_against,
-               SUM(count) AS count, SUM(dv_count) AS dv_count
-        FROM '{_CRIME_BY_AGENCY}' {w}
+               SUM(count)::BIGINT AS count, SUM(dv_count)::BIGINT AS dv_count
+        FROM crime_by_agency {w}
         GROUP BY agency_short, crime_against
         ORDER BY count DESC
-    """)
+    """, params)
 
 
 # ── Victims ──────────────────────────────────────────────────────────
@@ -175,14 +230,14 @@ def get_victims(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
+    w, params = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
     return _run(f"""
         SELECT age_bin, victim_race, victim_sex, crime_against,
-               SUM(count) AS count
-        FROM '{_VICTIM_DEMO}' {w}
+               SUM(count)::BIGINT AS count
+        FROM victim_demographics {w}
         GROUP BY age_bin, victim_race, victim_sex, crime_against
         ORDER BY count DESC
-    """)
+    """, params)
 
 
 # ── Domestic Violence ────────────────────────────────────────────────
@@ -191,16 +246,17 @@ def get_domestic_violence(
     year_min: int = 2021, year_max: int = 2025,
     agency: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, has_crime_against=False)
+    w, params = _where(year_min, year_max, has_crime_against=False)
     if agency:
-        w = _q(w, f"agency = '{agency.replace(chr(39), chr(39)*2)}'")
+        w = _q(w, "agency = ?")
+        params.append(agency)
     return _run(f"""
         SELECT agency, offense_group, victim_sex, month_start,
-               SUM(count) AS count
-        FROM '{_DV}' {w}
+               SUM(count)::BIGINT AS count
+        FROM domestic_violence {w}
         GROUP BY agency, offense_group, victim_sex, month_start
         ORDER BY month_start
-    """)
+    """, params)
 
 
 # ── Temporal patterns ────────────────────────────────────────────────
@@ -209,14 +265,14 @@ def get_temporal_patterns(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
+    w, params = _where(year_min, year_max, crime_against=crime_against, has_agency=False)
     return _run(f"""
         SELECT dow, month, crime_against,
-               SUM(count) AS count
-        FROM '{_TEMPORAL}' {w}
+               SUM(count)::BIGINT AS count
+        FROM temporal_patterns {w}
         GROUP BY dow, month, crime_against
         ORDER BY dow, month
-    """)
+    """, params)
 
 
 # ── Cities ───────────────────────────────────────────────────────────
@@ -225,14 +281,14 @@ def get_cities(
     year_min: int = 2021, year_max: int = 2025,
     crime_against: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, crime_against=crime_against, has_agency=False, has_city=False)
+    w, params = _where(year_min, year_max, crime_against=crime_against, has_agency=False, has_city=False)
     return _run(f"""
         SELECT city, crime_against,
-               SUM(count) AS count
-        FROM '{_CRIME_BY_CITY}' {w}
+               SUM(count)::BIGINT AS count
+        FROM crime_by_city {w}
         GROUP BY city, crime_against
         ORDER BY count DESC
-    """)
+    """, params)
 
 
 # ── Arrests (Group B) ───────────────────────────────────────────────
@@ -241,14 +297,14 @@ def get_arrests(
     year_min: int = 2021, year_max: int = 2025,
     agency: str | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, agency, has_crime_against=False)
+    w, params = _where(year_min, year_max, agency, has_crime_against=False)
     return _run(f"""
         SELECT offense_description, agency_short, month_start,
-               SUM(count) AS count
-        FROM '{_ARRESTS}' {w}
+               SUM(count)::BIGINT AS count
+        FROM arrests_by_type {w}
         GROUP BY offense_description, agency_short, month_start
         ORDER BY month_start
-    """)
+    """, params)
 
 
 # ── CFS monthly ─────────────────────────────────────────────────────
@@ -257,16 +313,17 @@ def get_calls_for_service(
     year_min: int = 2015, year_max: int = 2026,
     priority: int | None = None,
 ) -> list[dict]:
-    w = _where(year_min, year_max, has_agency=False, has_crime_against=False)
+    w, params = _where(year_min, year_max, has_agency=False, has_crime_against=False)
     if priority is not None:
-        w = _q(w, f"priority = {priority}")
+        w = _q(w, "priority = ?")
+        params.append(priority)
     return _run(f"""
         SELECT month_start, priority,
-               SUM(total_calls) AS total_calls
-        FROM '{_CFS_MONTHLY}' {w}
+               SUM(total_calls)::BIGINT AS total_calls
+        FROM cfs_monthly_priority {w}
         GROUP BY month_start, priority
         ORDER BY month_start
-    """)
+    """, params)
 
 
 # ── CFS by beat ──────────────────────────────────────────────────────
@@ -274,18 +331,22 @@ def get_calls_for_service(
 def get_calls_by_beat(
     year_min: int = 2015, year_max: int = 2026,
     priority: int | None = None,
-) -> list[dict]:
-    w = _where(year_min, year_max, has_agency=False, has_crime_against=False)
+    *, arrow: bool = False,
+) -> list[dict] | pa.Table:
+    w, params = _where(year_min, year_max, has_agency=False, has_crime_against=False)
     if priority is not None:
-        w = _q(w, f"priority = {priority}")
+        w = _q(w, "priority = ?")
+        params.append(priority)
+    # ORDER BY + LIMIT plans as a TOP_N heap, not a full sort; the beat and
+    # priority tiebreak keeps equal-volume rows in a stable order
     return _run(f"""
         SELECT beat, priority,
-               SUM(total_calls) AS total_calls
-        FROM '{_CFS_BY_BEAT}' {w}
+               SUM(total_calls)::BIGINT AS total_calls
+        FROM cfs_beat_priority {w}
         GROUP BY beat, priority
-        ORDER BY total_calls DESC
+        ORDER BY total_calls DESC, beat, priority
         LIMIT 100
-    """)
+    """, params, arrow=arrow)
 
 
 # ── CFS temporal ─────────────────────────────────────────────────────
@@ -293,13 +354,14 @@ def get_calls_by_beat(
 def get_calls_temporal(
     priority: int | None = None,
 ) -> list[dict]:
-    w = ""
+    w, params = "", []
     if priority is not None:
-        w = f"WHERE priority = {priority}"
+        w = "WHERE priority = ?"
+        params.append(priority)
     return _run(f"""
         SELECT dow, hour, priority,
-               SUM(total_calls) AS total_calls
-        FROM '{_CFS_TEMPORAL}' {w}
+               SUM(total_calls)::BIGINT AS total_calls
+        FROM cfs_temporal {w}
         GROUP BY dow, hour, priority
         ORDER BY dow, hour
-    """)
+    """, params)
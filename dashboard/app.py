@@ -2,13 +2,22 @@
 
 from __future__ import annotations
 
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import MAXYEAR, MINYEAR, date
+from functools import partial
 from pathlib import Path
 
 import duckdb
 import pandas as pd
 import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
 import pydeck as pdk
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
 
 # ── Paths ──────────────────────────────────────────────────────────────
 _AGG = "data/aggregated"
@@ -19,6 +28,15 @@ if (_root / _AGG).exists():
 if (_root / _PROC).exists():
     _PROC = str(_root / _PROC)
 
+# Aggregations the dashboard queries; the row-level map_points and the wide
+# cfs_by_beat are served through their map_grid / cfs_beat_priority roll-ups
+_TABLES = (
+    "arrests_by_type", "cfs_beat_priority", "cfs_monthly", "cfs_temporal",
+    "crime_by_agency", "crime_by_city", "crime_by_type", "crime_by_zip",
+    "crime_overview_monthly", "domestic_violence", "map_grid",
+    "temporal_patterns", "victim_demographics", "yearly_summary",
+)
+
 CHART_COLOR = "#83c9ff"
 
 # ── Page config ────────────────────────────────────────────────────────
@@ -38,12 +56,82 @@ st.caption(
 
 
 # ── Helpers ────────────────────────────────────────────────────────────
-def query(sql: str) -> pd.DataFrame:
+_INT_TYPES = (("TINYINT", 2**7), ("SMALLINT", 2**15), ("INTEGER", 2**31))
+
+
+def _load_narrowed(con: duckdb.DuckDBPyConnection, name: str) -> None:
+    """Load one aggregation, storing each BIGINT column in the narrowest int type that fits.
+
+    Years, months and hours need one or two bytes and counts four, so the
+    integer columns of the resident tables shrink by half or more. Plotly
+    narrows int64 arrays itself when encoding charts, so the browser payload
+    is unchanged; SUMs are already cast back to BIGINT in the queries.
+    """
+    src = f"read_parquet('{_AGG}/{name}.parquet')"
+    schema = con.execute(f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM {src})").fetchall()
+    cols = [col for col, col_type in schema if col_type == "BIGINT"]
+    casts = []
+    if cols:
+        bounds = con.execute(f"SELECT {', '.join(f'MIN({c}), MAX({c})' for c in cols)} FROM {src}").fetchone()
+        for col, lo, hi in zip(cols, bounds[::2], bounds[1::2]):
+            for sql_type, limit in _INT_TYPES:
+                if lo is not None and -limit <= lo and hi < limit:
+                    casts.append(f"{col}::{sql_type} AS {col}")
+                    break
+    replace = f" REPLACE ({', '.join(casts)})" if casts else ""
+    con.execute(f"CREATE TABLE {name} AS SELECT *{replace} FROM {src}")
+
+
+@st.cache_resource(ttl=3600)
+def _con() -> duckdb.DuckDBPyConnection:
+    """Shared connection with one in-memory table per aggregation the dashboard reads.
+
+    Most files are scanned by several tabs on every rerun; loading them once
+    (~150K rows in total) means each parquet is decoded once per hour, not per
+    query. The TTL matches query() so a pipeline rebuild is picked up.
+    """
     con = duckdb.connect()
-    try:
-        return con.execute(sql).fetchdf()
-    finally:
-        con.close()
+    for name in _TABLES:
+        _load_narrowed(con, name)
+    return con
+
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def query(sql: str, params: list | tuple = (), *, arrow: bool = False) -> pd.DataFrame | pa.Table:
+    """Run sql on a cursor; arrow=True skips pandas for frames that go straight to a chart."""
+    # SQL text plus the bound filter values form the cache key.
+    # Cursors share the cached connection but are safe across script reruns
+    with _con().cursor() as cur:
+        rel = cur.execute(sql, list(params))
+        return pa.table(rel.arrow()) if arrow else rel.fetchdf()
+
+
+@st.cache_resource
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def query_many(*calls: Callable[[], pd.DataFrame | pa.Table]) -> list:
+    """Run a tab's independent query() calls concurrently; results keep call order.
+
+    DuckDB releases the GIL while executing, so each call gets its own cursor
+    and the scans overlap. Workers borrow the script context so the
+    st.cache_data lookup inside query() sees this session, and hand it back
+    when done: pool threads outlive the run and serve other sessions.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        try:
+            return call()
+        finally:
+            # add_script_run_ctx(thread, None) keeps the attached ctx, so
+            # drop the attribute itself
+            vars(thread).pop(SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    return list(_pool().map(run, calls))
 
 
 def _fmt(n: int | float) -> str:
@@ -53,20 +141,27 @@ def _fmt(n: int | float) -> str:
 
 
 # ── Sidebar filters ───────────────────────────────────────────────────
-@st.cache_data(ttl=3600)
-def _sidebar_options():
-    years = query(f"SELECT DISTINCT year FROM '{_AGG}/crime_by_agency.parquet' ORDER BY year")["year"].tolist()
-    agencies = query(f"SELECT DISTINCT agency_short FROM '{_AGG}/crime_by_agency.parquet' ORDER BY agency_short")["agency_short"].tolist()
-    categories = query(f"SELECT DISTINCT crime_against FROM '{_AGG}/crime_by_agency.parquet' WHERE crime_against IS NOT NULL ORDER BY crime_against")["crime_against"].tolist()
-    cities = query(f"""
-        SELECT DISTINCT city FROM '{_AGG}/crime_by_city.parquet'
-        WHERE city IS NOT NULL
-        ORDER BY city
-    """)["city"].tolist()
-    return years, agencies, categories, cities
+def _data_version() -> int:
+    """Newest aggregation parquet mtime; changes whenever the pipeline re-runs."""
+    return max((p.stat().st_mtime_ns for p in Path(_AGG).glob("*.parquet")), default=0)
 
 
-years, agencies, categories, cities = _sidebar_options()
+@st.cache_data(persist="disk", show_spinner=False)
+def _sidebar_options(data_version: int):
+    # data_version only keys the disk cache so a rebuild invalidates it
+    opts = query("""
+        SELECT list(DISTINCT year ORDER BY year) AS years,
+               list(DISTINCT agency_short ORDER BY agency_short) AS agencies,
+               list(DISTINCT crime_against ORDER BY crime_against)
+                   FILTER (WHERE crime_against IS NOT NULL) AS categories,
+               (SELECT list(DISTINCT city ORDER BY city) FROM crime_by_city
+                WHERE city IS NOT NULL) AS cities
+        FROM crime_by_agency
+    """, arrow=True).to_pylist()[0]
+    return opts["years"], opts["agencies"], opts["categories"], opts["cities"]
+
+
+years, agencies, categories, cities = _sidebar_options(_data_version())
 
 # ── About This Data (sidebar expander) ────────────────────────────────
 with st.sidebar.expander("About This Data", expanded=False):
@@ -136,29 +231,45 @@ def _where_clause(
     has_crime_against: bool = True,
     has_city: bool = False,
     year_col: str = "year",
-) -> str:
-    parts: list[str] = []
-    parts.append(f"{year_col} >= {yr[0]}")
-    parts.append(f"{year_col} <= {yr[1]}")
+    month_col: str | None = None,
+    agency_col: str = "agency_short",
+) -> tuple[str, list]:
+    """Build a WHERE clause plus the values for its ``?`` placeholders."""
+    if month_col:
+        # Bare date range keeps min/max pruning that YEAR(month_col) would defeat
+        parts = [f"{month_col} >= ?", f"{month_col} < ?"]
+        # Clamped to the years date() can hold; out-of-range bounds still
+        # match nothing rather than raising
+        params: list = [date(min(max(y, MINYEAR), MAXYEAR), 1, 1) for y in (yr[0], yr[1] + 1)]
+    else:
+        parts = [f"{year_col} >= ?", f"{year_col} <= ?"]
+        params = [yr[0], yr[1]]
     if agencies_list and has_agency:
-        escaped = ", ".join(f"'{a.replace(chr(39), chr(39)*2)}'" for a in agencies_list)
-        parts.append(f"agency_short IN ({escaped})")
+        parts.append(f"{agency_col} IN ?")
+        params.append(list(agencies_list))
     if categories_list and has_crime_against:
-        escaped = ", ".join(f"'{c.replace(chr(39), chr(39)*2)}'" for c in categories_list)
-        parts.append(f"crime_against IN ({escaped})")
+        parts.append("crime_against IN ?")
+        params.append(list(categories_list))
     if cities_list and has_city:
-        escaped = ", ".join(f"'{c.replace(chr(39), chr(39)*2)}'" for c in cities_list)
-        parts.append(f"city IN ({escaped})")
-    return "WHERE " + " AND ".join(parts) if parts else ""
+        parts.append("city IN ?")
+        params.append(list(cities_list))
+    return "WHERE " + " AND ".join(parts), params
 
 
-WHERE = _where_clause()
-WHERE_NO_AGENCY = _where_clause(has_agency=False)
-WHERE_NO_CRIME = _where_clause(has_crime_against=False)
-WHERE_NO_BOTH = _where_clause(has_agency=False, has_crime_against=False)
+WHERE, WHERE_PARAMS = _where_clause()
+WHERE_NO_AGENCY, WHERE_NO_AGENCY_PARAMS = _where_clause(has_agency=False)
+WHERE_NO_CRIME, WHERE_NO_CRIME_PARAMS = _where_clause(has_crime_against=False)
 
 DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
 MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+HOUR_LABELS = [f"{h % 12 or 12}{'am' if h < 12 else 'pm'}" for h in range(24)]
+
+
+def _labels(codes: pd.Series, names: list[str], first: int = 0) -> pd.Categorical:
+    """Map integer codes (``first`` = names[0]) to ordered labels; bad codes become NaN."""
+    idx = codes.fillna(first - 1).to_numpy(dtype="int64") - first
+    idx[(idx < 0) | (idx >= len(names))] = -1
+    return pd.Categorical.from_codes(idx, categories=names, ordered=True)
 
 # ── Tabs ───────────────────────────────────────────────────────────────
 tab_overview, tab_map, tab_trends, tab_cfs, tab_geo, tab_types, tab_equity = st.tabs([
@@ -171,16 +282,54 @@ tab_overview, tab_map, tab_trends, tab_cfs, tab_geo, tab_types, tab_equity = st.
 # TAB 1: Overview
 # ═══════════════════════════════════════════════════════════════════════
 with tab_overview:
-    summary = query(f"""
-        SELECT year, total, person_crimes, property_crimes, society_crimes,
-               dv_total, stolen_vehicle_total
-        FROM '{_AGG}/yearly_summary.parquet'
-        WHERE year >= {year_range[0]} AND year <= {year_range[1]}
-        ORDER BY year
-    """)
-
-    if not summary.empty:
-        totals = summary.sum()
+    totals, top_offenses, agency_df, cat_df = query_many(
+        # Range totals and the last two years' totals in one row; LAG runs over
+        # the filtered years so "previous" is the year before the last in range
+        partial(query, """
+            WITH y AS (
+                SELECT *, LAG(total) OVER (ORDER BY year) AS prev_total
+                FROM yearly_summary
+                WHERE year >= ? AND year <= ?
+            )
+            SELECT COUNT(*) AS n_years,
+                   SUM(total)::BIGINT AS total,
+                   SUM(person_crimes)::BIGINT AS person_crimes,
+                   SUM(property_crimes)::BIGINT AS property_crimes,
+                   SUM(society_crimes)::BIGINT AS society_crimes,
+                   SUM(dv_total)::BIGINT AS dv_total,
+                   SUM(stolen_vehicle_total)::BIGINT AS stolen_vehicle_total,
+                   ARG_MAX(total, year) AS latest_total,
+                   (ARG_MAX(total, year) - ARG_MAX(prev_total, year)) * 100.0
+                       / ARG_MAX(prev_total, year) AS yoy
+            FROM y
+        """, year_range, arrow=True),
+        partial(query, f"""
+            SELECT offense_description, SUM(count)::BIGINT AS count
+            FROM crime_by_type {WHERE_NO_AGENCY}
+            GROUP BY offense_description
+            ORDER BY count DESC LIMIT 10
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT agency_short, SUM(count)::BIGINT AS count
+            FROM crime_by_agency {WHERE}
+            GROUP BY agency_short
+            ORDER BY count DESC
+        """, WHERE_PARAMS, arrow=True),
+        # Long format for the category chart, unpivoted in SQL
+        partial(query, """
+            UNPIVOT (
+                SELECT year, person_crimes, property_crimes, society_crimes
+                FROM yearly_summary
+                WHERE year >= ? AND year <= ?
+            )
+            ON person_crimes AS Person, property_crimes AS Property, society_crimes AS Society
+            INTO NAME category VALUE count
+            ORDER BY category, year
+        """, year_range, arrow=True),
+    )
+    totals = totals.to_pylist()[0]
+
+    if totals["n_years"]:
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Total Incidents", _fmt(totals["total"]))
         c2.metric("Crimes Against People", _fmt(totals["person_crimes"]))
@@ -190,26 +339,17 @@ with tab_overview:
         c5, c6, c7, c8 = st.columns(4)
         c5.metric("Domestic Violence", _fmt(totals["dv_total"]))
         c6.metric("Stolen Vehicles", _fmt(totals["stolen_vehicle_total"]))
-        latest = summary.iloc[-1]
-        if len(summary) >= 2:
-            prev = summary.iloc[-2]
-            yoy = (latest["total"] - prev["total"]) / prev["total"] * 100
-            c7.metric("Latest Year", _fmt(latest["total"]), f"{yoy:+.1f}% YoY")
+        if totals["yoy"] is not None:
+            c7.metric("Latest Year", _fmt(totals["latest_total"]), f"{totals['yoy']:+.1f}% YoY")
         else:
-            c7.metric("Latest Year", _fmt(latest["total"]))
+            c7.metric("Latest Year", _fmt(totals["latest_total"]))
         c8.metric("Years Covered", f"{year_range[0]}-{year_range[1]}")
 
     # Top offenses
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Top 10 Offenses")
-        top_offenses = query(f"""
-            SELECT offense_description, SUM(count) AS count
-            FROM '{_AGG}/crime_by_type.parquet' {WHERE_NO_AGENCY}
-            GROUP BY offense_description
-            ORDER BY count DESC LIMIT 10
-        """)
-        if not top_offenses.empty:
+        if top_offenses.num_rows:
             fig = px.bar(top_offenses, x="count", y="offense_description",
                          orientation="h", color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Incidents")
@@ -217,13 +357,7 @@ with tab_overview:
 
     with col2:
         st.subheader("Agency Breakdown")
-        agency_df = query(f"""
-            SELECT agency_short, SUM(count) AS count
-            FROM '{_AGG}/crime_by_agency.parquet' {WHERE}
-            GROUP BY agency_short
-            ORDER BY count DESC
-        """)
-        if not agency_df.empty:
+        if agency_df.num_rows:
             fig = px.bar(agency_df, x="count", y="agency_short",
                          orientation="h", color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Incidents")
@@ -231,13 +365,7 @@ with tab_overview:
 
     # Crime category split
     st.subheader("Crime Category Split by Year")
-    if not summary.empty:
-        cat_df = summary.melt(
-            id_vars=["year"],
-            value_vars=["person_crimes", "property_crimes", "society_crimes"],
-            var_name="category", value_name="count",
-        )
-        cat_df["category"] = cat_df["category"].str.replace("_crimes", "").str.title()
+    if cat_df.num_rows:
         fig = px.bar(cat_df, x="year", y="count", color="category", barmode="group")
         fig.update_layout(xaxis_title="Year", yaxis_title="Incidents")
         st.plotly_chart(fig, use_container_width=True)
@@ -248,28 +376,24 @@ with tab_overview:
 # ═══════════════════════════════════════════════════════════════════════
 with tab_map:
     st.subheader("Crime Heatmap")
-    st.caption("County-wide view. Random sample of up to 200K points for performance.")
-
-    map_where = _where_clause(has_agency=False, has_city=False)
-    # map_points uses "agency" not "agency_short"
-    if selected_agencies:
-        escaped = ", ".join(f"'{a.replace(chr(39), chr(39)*2)}'" for a in selected_agencies)
-        map_where = map_where.replace("agency_short IN", "agency IN") if "agency_short IN" in map_where else map_where
+    st.caption("County-wide view. Incidents are binned into ~500 m grid cells before drawing.")
 
+    # Pre-binned 0.005 degree cells keep every incident while sending a few
+    # thousand rows
     map_df = query(f"""
-        SELECT lat, lng FROM '{_AGG}/map_points.parquet'
-        {map_where}
-        ORDER BY RANDOM() LIMIT 200000
-    """)
+        SELECT lat, lng, SUM(count)::BIGINT AS w
+        FROM map_grid
+        {WHERE_NO_AGENCY}
+        GROUP BY lat, lng
+    """, WHERE_NO_AGENCY_PARAMS)
 
     if not map_df.empty:
         layer = pdk.Layer(
-            "HeatmapLayer",
+            "ScreenGridLayer",
             data=map_df,
             get_position=["lng", "lat"],
-            radiusPixels=30,
-            intensity=1,
-            threshold=0.05,
+            get_weight="w",
+            cell_size_pixels=20,
             opacity=0.7,
         )
         view = pdk.ViewState(
@@ -278,7 +402,7 @@ with tab_map:
         st.pydeck_chart(pdk.Deck(
             layers=[layer], initial_view_state=view, map_style="light",
         ))
-        st.caption(f"Showing {len(map_df):,} points")
+        st.caption(f"Showing {int(map_df['w'].sum()):,} incidents in {len(map_df):,} cells")
     else:
         st.info("No map data available for selected filters.")
 
@@ -287,18 +411,37 @@ with tab_map:
 # TAB 3: Crime Trends
 # ═══════════════════════════════════════════════════════════════════════
 with tab_trends:
-    st.subheader("Monthly Crime Trends")
-    WHERE_MONTHLY = _where_clause(year_col="YEAR(month_start)")
-    monthly = query(f"""
-        SELECT month_start, crime_against,
-               SUM(total_incidents) AS total_incidents
-        FROM '{_AGG}/crime_overview_monthly.parquet' {WHERE_MONTHLY}
-        GROUP BY month_start, crime_against
-        ORDER BY month_start
-    """)
-
-    if not monthly.empty:
-        monthly["month_start"] = pd.to_datetime(monthly["month_start"])
+    WHERE_MONTHLY, WHERE_MONTHLY_PARAMS = _where_clause(month_col="month_start")
+    monthly, yoy_df, seasonal, dow_df = query_many(
+        partial(query, f"""
+            SELECT month_start, crime_against,
+                   SUM(total_incidents)::BIGINT AS total_incidents
+            FROM crime_overview_monthly {WHERE_MONTHLY}
+            GROUP BY month_start, crime_against
+            ORDER BY month_start
+        """, WHERE_MONTHLY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT YEAR(month_start) AS year, crime_against, SUM(total_incidents)::BIGINT AS total
+            FROM crime_overview_monthly {WHERE_MONTHLY}
+            GROUP BY YEAR(month_start), crime_against
+            ORDER BY year
+        """, WHERE_MONTHLY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT month, crime_against, SUM(count)::BIGINT AS count
+            FROM temporal_patterns {WHERE_NO_AGENCY}
+            GROUP BY month, crime_against
+            ORDER BY month
+        """, WHERE_NO_AGENCY_PARAMS),
+        # One row per weekday, one column per month; fixed IN list keeps all 12
+        partial(query, f"""
+            PIVOT (SELECT dow, month, count FROM temporal_patterns {WHERE_NO_AGENCY})
+            ON month IN ({", ".join(map(str, range(1, 13)))})
+            USING SUM(count)::FLOAT
+            GROUP BY dow
+        """, WHERE_NO_AGENCY_PARAMS),
+    )
+
+    if monthly.num_rows:
         fig = px.line(monthly, x="month_start", y="total_incidents",
                       color="crime_against", labels={"month_start": "Month", "total_incidents": "Incidents"})
         st.plotly_chart(fig, use_container_width=True)
@@ -307,45 +450,26 @@ with tab_trends:
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Year-over-Year")
-        yoy_df = query(f"""
-            SELECT YEAR(month_start) AS year, crime_against, SUM(total_incidents) AS total
-            FROM '{_AGG}/crime_overview_monthly.parquet' {WHERE_MONTHLY}
-            GROUP BY YEAR(month_start), crime_against
-            ORDER BY year
-        """)
-        if not yoy_df.empty:
+        if yoy_df.num_rows:
             fig = px.bar(yoy_df, x="year", y="total", color="crime_against", barmode="group")
             fig.update_layout(xaxis_title="Year", yaxis_title="Incidents")
             st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Seasonal Patterns")
-        seasonal = query(f"""
-            SELECT month, crime_against, SUM(count) AS count
-            FROM '{_AGG}/temporal_patterns.parquet' {WHERE_NO_AGENCY}
-            GROUP BY month, crime_against
-            ORDER BY month
-        """)
         if not seasonal.empty:
-            seasonal["month_name"] = seasonal["month"].map(lambda m: MONTH_NAMES[int(m) - 1] if pd.notna(m) and 1 <= int(m) <= 12 else "?")
+            seasonal["month_name"] = _labels(seasonal["month"], MONTH_NAMES, first=1)
             fig = px.line(seasonal, x="month_name", y="count", color="crime_against")
             fig.update_layout(xaxis_title="Month", yaxis_title="Incidents")
             st.plotly_chart(fig, use_container_width=True)
 
     # Day of week heatmap
     st.subheader("Day-of-Week Patterns")
-    dow_df = query(f"""
-        SELECT dow, month, SUM(count) AS count
-        FROM '{_AGG}/temporal_patterns.parquet' {WHERE_NO_AGENCY}
-        GROUP BY dow, month
-    """)
     if not dow_df.empty:
-        dow_df["day_name"] = dow_df["dow"].map(lambda d: DAY_NAMES[int(d)] if pd.notna(d) and 0 <= int(d) <= 6 else "?")
-        dow_df["month_name"] = dow_df["month"].map(lambda m: MONTH_NAMES[int(m) - 1] if pd.notna(m) and 1 <= int(m) <= 12 else "?")
-        pivot = dow_df.pivot_table(index="day_name", columns="month_name", values="count", aggfunc="sum")
-        pivot = pivot.reindex(DAY_NAMES, axis=0)
-        pivot = pivot.reindex(MONTH_NAMES, axis=1)
-        fig = px.imshow(pivot, color_continuous_scale="Blues",
+        # Reindex keeps every weekday in calendar order, then codes become labels
+        grid = dow_df.set_index("dow").reindex(range(7))
+        grid = grid.set_axis(DAY_NAMES).set_axis(MONTH_NAMES, axis=1)
+        fig = px.imshow(grid, color_continuous_scale="Blues",
                         labels=dict(x="Month", y="Day", color="Incidents"))
         st.plotly_chart(fig, use_container_width=True)
 
@@ -358,17 +482,41 @@ with tab_cfs:
 
     cfs_yr = st.slider("CFS Year Range", 2015, 2026, (2015, 2025), key="cfs_yr")
 
-    cfs_where = f"WHERE year >= {cfs_yr[0]} AND year <= {cfs_yr[1]}"
+    cfs_where = "WHERE year >= ? AND year <= ?"
+    cfs, beats, cfs_temporal = query_many(
+        # Volume, priority and call-type totals from one scan of cfs_monthly;
+        # grp names the grouping set each row belongs to
+        partial(query, f"""
+            SELECT CASE WHEN GROUPING(month_start) = 0 THEN 'month'
+                        WHEN GROUPING(priority) = 0 THEN 'priority'
+                        ELSE 'call_type' END AS grp,
+                   month_start, CAST(priority AS VARCHAR) AS priority, call_type_desc,
+                   SUM(total_calls)::BIGINT AS total_calls
+            FROM cfs_monthly
+            {cfs_where}
+            GROUP BY GROUPING SETS ((month_start), (priority), (call_type_desc))
+        """, cfs_yr, arrow=True),
+        partial(query, f"""
+            SELECT beat, SUM(total_calls)::BIGINT AS total_calls
+            FROM cfs_beat_priority
+            {cfs_where}
+            GROUP BY beat ORDER BY total_calls DESC LIMIT 20
+        """, cfs_yr, arrow=True),
+        partial(query, f"""
+            PIVOT (SELECT dow, hour, total_calls FROM cfs_temporal)
+            ON hour IN ({", ".join(map(str, range(24)))})
+            USING SUM(total_calls)::FLOAT
+            GROUP BY dow
+        """),
+    )
 
     # Volume over time
-    cfs_monthly = query(f"""
-        SELECT month_start, SUM(total_calls) AS total_calls
-        FROM '{_AGG}/cfs_monthly.parquet'
-        {cfs_where} AND month_start IS NOT NULL
-        GROUP BY month_start ORDER BY month_start
-    """)
-    if not cfs_monthly.empty:
-        cfs_monthly["month_start"] = pd.to_datetime(cfs_monthly["month_start"])
+    cfs_monthly = (
+        cfs.filter((pc.field("grp") == "month") & pc.field("month_start").is_valid())
+        .select(["month_start", "total_calls"])
+        .sort_by("month_start")
+    )
+    if cfs_monthly.num_rows:
         fig = px.line(cfs_monthly, x="month_start", y="total_calls",
                       color_discrete_sequence=[CHART_COLOR])
         fig.update_layout(xaxis_title="Month", yaxis_title="Calls")
@@ -377,14 +525,12 @@ with tab_cfs:
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Priority Breakdown")
-        priority_df = query(f"""
-            SELECT priority, SUM(total_calls) AS total_calls
-            FROM '{_AGG}/cfs_monthly.parquet'
-            {cfs_where}
-            GROUP BY priority ORDER BY priority
-        """)
-        if not priority_df.empty:
-            priority_df["priority"] = priority_df["priority"].astype(str)
+        priority_df = (
+            cfs.filter(pc.field("grp") == "priority")
+            .select(["priority", "total_calls"])
+            .sort_by("priority")
+        )
+        if priority_df.num_rows:
             fig = px.bar(priority_df, x="priority", y="total_calls",
                          color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(xaxis_title="Priority", yaxis_title="Total Calls")
@@ -392,14 +538,13 @@ with tab_cfs:
 
     with col2:
         st.subheader("Top Call Types")
-        call_types = query(f"""
-            SELECT call_type_desc, SUM(total_calls) AS total_calls
-            FROM '{_AGG}/cfs_monthly.parquet'
-            {cfs_where}
-            GROUP BY call_type_desc
-            ORDER BY total_calls DESC LIMIT 15
-        """)
-        if not call_types.empty:
+        call_types = (
+            cfs.filter(pc.field("grp") == "call_type")
+            .select(["call_type_desc", "total_calls"])
+            .sort_by([("total_calls", "descending")])
+            .slice(0, 15)
+        )
+        if call_types.num_rows:
             fig = px.bar(call_types, x="total_calls", y="call_type_desc",
                          orientation="h", color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Calls")
@@ -407,13 +552,7 @@ with tab_cfs:
 
     # Beat-level patterns
     st.subheader("Top Beats by Call Volume")
-    beats = query(f"""
-        SELECT beat, SUM(total_calls) AS total_calls
-        FROM '{_AGG}/cfs_by_beat.parquet'
-        {cfs_where}
-        GROUP BY beat ORDER BY total_calls DESC LIMIT 20
-    """)
-    if not beats.empty:
+    if beats.num_rows:
         fig = px.bar(beats, x="beat", y="total_calls",
                      color_discrete_sequence=[CHART_COLOR])
         fig.update_layout(xaxis_title="Beat", yaxis_title="Total Calls")
@@ -421,19 +560,10 @@ with tab_cfs:
 
     # Day/hour heatmap
     st.subheader("Day-of-Week / Hour Heatmap")
-    cfs_temporal = query(f"""
-        SELECT dow, hour, SUM(total_calls) AS total_calls
-        FROM '{_AGG}/cfs_temporal.parquet'
-        GROUP BY dow, hour
-    """)
     if not cfs_temporal.empty:
-        cfs_temporal["day_name"] = cfs_temporal["dow"].map(lambda d: DAY_NAMES[int(d)] if pd.notna(d) and 0 <= int(d) <= 6 else "?")
-        hour_labels = [f"{h % 12 or 12}{'am' if h < 12 else 'pm'}" for h in range(24)]
-        cfs_temporal["hour_label"] = cfs_temporal["hour"].map(lambda h: hour_labels[int(h)] if pd.notna(h) and 0 <= int(h) <= 23 else "?")
-        pivot = cfs_temporal.pivot_table(index="day_name", columns="hour_label", values="total_calls", aggfunc="sum")
-        pivot = pivot.reindex(DAY_NAMES, axis=0)
-        pivot = pivot.reindex(hour_labels, axis=1)
-        fig = px.imshow(pivot, color_continuous_scale="Blues",
+        grid = cfs_temporal.set_index("dow").reindex(range(7))
+        grid = grid.set_axis(DAY_NAMES).set_axis(HOUR_LABELS, axis=1)
+        fig = px.imshow(grid, color_continuous_scale="Blues",
                         labels=dict(x="Hour", y="Day", color="Calls"))
         st.plotly_chart(fig, use_container_width=True)
 
@@ -442,18 +572,43 @@ with tab_cfs:
 # TAB 5: Geographic
 # ═══════════════════════════════════════════════════════════════════════
 with tab_geo:
+    zips, city_df, cfs_beats = query_many(
+        # Every ZIP's total from one scan of crime_by_zip; the top and bottom
+        # charts are both sliced from it
+        partial(query, f"""
+            SELECT zip_code || ' (' || COALESCE(city, '') || ')' AS label,
+                   SUM(count)::BIGINT AS count
+            FROM crime_by_zip {WHERE_NO_AGENCY}
+            GROUP BY zip_code, city
+            ORDER BY count DESC, label
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        # Only the 15 cities with the most incidents; city_total ranks whole
+        # cities so each keeps all of its crime_against rows
+        partial(query, f"""
+            SELECT city, crime_against, count
+            FROM (
+                SELECT city, crime_against, SUM(count)::BIGINT AS count,
+                       SUM(SUM(count)) OVER (PARTITION BY city) AS city_total
+                FROM crime_by_city {WHERE_NO_AGENCY}
+                GROUP BY city, crime_against
+            )
+            QUALIFY DENSE_RANK() OVER (ORDER BY city_total DESC, city) <= 15
+            ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT beat, SUM(total_calls)::BIGINT AS total_calls
+            FROM cfs_beat_priority
+            WHERE year >= ? AND year <= ?
+            GROUP BY beat ORDER BY total_calls DESC LIMIT 20
+        """, year_range, arrow=True),
+    )
+
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Top ZIP Codes by Crime Count")
-        top_zips = query(f"""
-            SELECT zip_code, city, SUM(count) AS count
-            FROM '{_AGG}/crime_by_zip.parquet' {WHERE_NO_AGENCY}
-            GROUP BY zip_code, city
-            ORDER BY count DESC LIMIT 20
-        """)
-        if not top_zips.empty:
-            top_zips["label"] = top_zips["zip_code"] + " (" + top_zips["city"].fillna("") + ")"
+        top_zips = zips.slice(0, 20)
+        if top_zips.num_rows:
             fig = px.bar(top_zips, x="count", y="label", orientation="h",
                          color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Incidents")
@@ -461,15 +616,8 @@ with tab_geo:
 
     with col2:
         st.subheader("Bottom ZIP Codes (lowest crime)")
-        bottom_zips = query(f"""
-            SELECT zip_code, city, SUM(count) AS count
-            FROM '{_AGG}/crime_by_zip.parquet' {WHERE_NO_AGENCY}
-            GROUP BY zip_code, city
-            HAVING SUM(count) >= 10
-            ORDER BY count ASC LIMIT 20
-        """)
-        if not bottom_zips.empty:
-            bottom_zips["label"] = bottom_zips["zip_code"] + " (" + bottom_zips["city"].fillna("") + ")"
+        bottom_zips = zips.filter(pc.field("count") >= 10).sort_by("count").slice(0, 20)
+        if bottom_zips.num_rows:
             fig = px.bar(bottom_zips, x="count", y="label", orientation="h",
                          color_discrete_sequence=["#2a6496"])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Incidents")
@@ -477,29 +625,14 @@ with tab_geo:
 
     # City comparison
     st.subheader("City Comparison")
-    city_df = query(f"""
-        SELECT city, crime_against, SUM(count) AS count
-        FROM '{_AGG}/crime_by_city.parquet' {WHERE_NO_AGENCY}
-        GROUP BY city, crime_against
-        ORDER BY count DESC
-    """)
-    if not city_df.empty:
-        # Top 15 cities by total
-        top_cities = city_df.groupby("city")["count"].sum().nlargest(15).index
-        city_filtered = city_df[city_df["city"].isin(top_cities)]
-        fig = px.bar(city_filtered, x="city", y="count", color="crime_against", barmode="stack")
+    if city_df.num_rows:
+        fig = px.bar(city_df, x="city", y="count", color="crime_against", barmode="stack")
         fig.update_layout(xaxis_title="City", yaxis_title="Incidents")
         st.plotly_chart(fig, use_container_width=True)
 
     # CFS by beat
     st.subheader("CFS by Beat (Top 20)")
-    cfs_beats = query(f"""
-        SELECT beat, SUM(total_calls) AS total_calls
-        FROM '{_AGG}/cfs_by_beat.parquet'
-        WHERE year >= {year_range[0]} AND year <= {year_range[1]}
-        GROUP BY beat ORDER BY total_calls DESC LIMIT 20
-    """)
-    if not cfs_beats.empty:
+    if cfs_beats.num_rows:
         fig = px.bar(cfs_beats, x="beat", y="total_calls",
                      color_discrete_sequence=[CHART_COLOR])
         fig.update_layout(xaxis_title="Beat", yaxis_title="Total Calls")
@@ -510,31 +643,52 @@ with tab_geo:
 # TAB 6: Crime Types
 # ═══════════════════════════════════════════════════════════════════════
 with tab_types:
+    cat_totals, groups, cat_trend, detail, arrests_df = query_many(
+        partial(query, f"""
+            SELECT crime_against, SUM(count)::BIGINT AS count
+            FROM crime_by_type {WHERE_NO_AGENCY}
+            GROUP BY crime_against
+            ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT offense_group, SUM(count)::BIGINT AS count
+            FROM crime_by_type {WHERE_NO_AGENCY}
+            AND offense_group IS NOT NULL
+            GROUP BY offense_group
+            ORDER BY count DESC LIMIT 15
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT year, crime_against, SUM(count)::BIGINT AS count
+            FROM crime_by_type {WHERE_NO_AGENCY}
+            GROUP BY year, crime_against
+            ORDER BY year
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT offense_description, crime_against, SUM(count)::BIGINT AS count
+            FROM crime_by_type {WHERE_NO_AGENCY}
+            GROUP BY offense_description, crime_against
+            ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT offense_description, month_start, SUM(count)::BIGINT AS count
+            FROM arrests_by_type {WHERE_NO_CRIME}
+            GROUP BY offense_description, month_start
+            ORDER BY month_start
+        """, WHERE_NO_CRIME_PARAMS, arrow=True),
+    )
+
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Crime Category Breakdown")
-        cat_totals = query(f"""
-            SELECT crime_against, SUM(count) AS count
-            FROM '{_AGG}/crime_by_type.parquet' {WHERE_NO_AGENCY}
-            GROUP BY crime_against
-            ORDER BY count DESC
-        """)
-        if not cat_totals.empty:
+        if cat_totals.num_rows:
             fig = px.pie(cat_totals, values="count", names="crime_against",
                          color_discrete_sequence=px.colors.qualitative.Set2)
             st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Offense Groups")
-        groups = query(f"""
-            SELECT offense_group, SUM(count) AS count
-            FROM '{_AGG}/crime_by_type.parquet' {WHERE_NO_AGENCY}
-            WHERE offense_group IS NOT NULL
-            GROUP BY offense_group
-            ORDER BY count DESC LIMIT 15
-        """)
-        if not groups.empty:
+        if groups.num_rows:
             fig = px.bar(groups, x="count", y="offense_group", orientation="h",
                          color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="", xaxis_title="Incidents")
@@ -542,40 +696,20 @@ with tab_types:
 
     # Trend by category
     st.subheader("Trend by Crime Category")
-    cat_trend = query(f"""
-        SELECT year, crime_against, SUM(count) AS count
-        FROM '{_AGG}/crime_by_type.parquet' {WHERE_NO_AGENCY}
-        GROUP BY year, crime_against
-        ORDER BY year
-    """)
-    if not cat_trend.empty:
+    if cat_trend.num_rows:
         fig = px.line(cat_trend, x="year", y="count", color="crime_against")
         fig.update_layout(xaxis_title="Year", yaxis_title="Incidents")
         st.plotly_chart(fig, use_container_width=True)
 
     # Detail table
     st.subheader("Offense Detail")
-    detail = query(f"""
-        SELECT offense_description, crime_against, SUM(count) AS count
-        FROM '{_AGG}/crime_by_type.parquet' {WHERE_NO_AGENCY}
-        GROUP BY offense_description, crime_against
-        ORDER BY count DESC
-    """)
-    if not detail.empty:
+    if detail.num_rows:
         st.dataframe(detail, use_container_width=True, hide_index=True,
                      column_config={"count": st.column_config.NumberColumn("Incidents", format="%d")})
 
     # Group B arrests
     st.subheader("Arrests: DUI / Disorderly Conduct / Vagrancy")
-    arrests_where = _where_clause(has_crime_against=False)
-    arrests_df = query(f"""
-        SELECT offense_description, month_start, SUM(count) AS count
-        FROM '{_AGG}/arrests_by_type.parquet' {arrests_where}
-        GROUP BY offense_description, month_start
-        ORDER BY month_start
-    """)
-    if not arrests_df.empty:
-        arrests_df["month_start"] = pd.to_datetime(arrests_df["month_start"])
+    if arrests_df.num_rows:
         fig = px.line(arrests_df, x="month_start", y="count", color="offense_description")
         fig.update_layout(xaxis_title="Month", yaxis_title="Arrests")
         st.plotly_chart(fig, use_container_width=True)
@@ -585,6 +719,52 @@ with tab_types:
 # TAB 7: Equity
 # ═══════════════════════════════════════════════════════════════════════
 with tab_equity:
+    # DV table uses "agency" not "agency_short"
+    dv_where, dv_params = _where_clause(has_crime_against=False, agency_col="agency")
+    age_df, race_df, sex_df, vic_trend, dv_df, zip_totals = query_many(
+        partial(query, f"""
+            SELECT age_bin, SUM(count)::BIGINT AS count
+            FROM victim_demographics {WHERE_NO_AGENCY}
+            AND age_bin != 'Unknown'
+            GROUP BY age_bin ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT victim_race, SUM(count)::BIGINT AS count
+            FROM victim_demographics {WHERE_NO_AGENCY}
+            AND victim_race IS NOT NULL
+            GROUP BY victim_race ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT victim_sex, SUM(count)::BIGINT AS count
+            FROM victim_demographics {WHERE_NO_AGENCY}
+            AND victim_sex IS NOT NULL
+            GROUP BY victim_sex ORDER BY count DESC
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT year, crime_against, SUM(count)::BIGINT AS count
+            FROM victim_demographics {WHERE_NO_AGENCY}
+            GROUP BY year, crime_against
+            ORDER BY year
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+        partial(query, f"""
+            SELECT agency, month_start, SUM(count)::BIGINT AS count
+            FROM domestic_violence {dv_where}
+            GROUP BY agency, month_start
+            ORDER BY month_start
+        """, dv_params, arrow=True),
+        # One scan of crime_by_zip; the highest and lowest lists are both
+        # sliced from it, as on the Geographic tab
+        partial(query, f"""
+            SELECT zip_code || ' (' || COALESCE(city, '') || ')' AS label,
+                   SUM(count)::BIGINT AS count
+            FROM crime_by_zip {WHERE_NO_AGENCY}
+            GROUP BY zip_code, city
+            ORDER BY count DESC, label
+        """, WHERE_NO_AGENCY_PARAMS, arrow=True),
+    )
+    high_zips = zip_totals.slice(0, 10)
+    low_zips = zip_totals.filter(pc.field("count") >= 10).sort_by("count").slice(0, 10)
+
     # Victim demographics
     st.subheader("Victim Demographics")
     st.caption(
@@ -597,26 +777,14 @@ with tab_equity:
 
     with col1:
         st.markdown("**By Age**")
-        age_df = query(f"""
-            SELECT age_bin, SUM(count) AS count
-            FROM '{_AGG}/victim_demographics.parquet' {WHERE_NO_AGENCY}
-            WHERE age_bin != 'Unknown'
-            GROUP BY age_bin ORDER BY count DESC
-        """)
-        if not age_df.empty:
+        if age_df.num_rows:
             fig = px.bar(age_df, x="age_bin", y="count", color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(xaxis_title="Age Group", yaxis_title="Victims")
             st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.markdown("**By Race**")
-        race_df = query(f"""
-            SELECT victim_race, SUM(count) AS count
-            FROM '{_AGG}/victim_demographics.parquet' {WHERE_NO_AGENCY}
-            WHERE victim_race IS NOT NULL
-            GROUP BY victim_race ORDER BY count DESC
-        """)
-        if not race_df.empty:
+        if race_df.num_rows:
             fig = px.bar(race_df, x="victim_race", y="count", color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(xaxis_title="Race", yaxis_title="Victims")
             st.plotly_chart(fig, use_container_width=True)
@@ -624,45 +792,21 @@ with tab_equity:
     col3, col4 = st.columns(2)
     with col3:
         st.markdown("**By Sex**")
-        sex_df = query(f"""
-            SELECT victim_sex, SUM(count) AS count
-            FROM '{_AGG}/victim_demographics.parquet' {WHERE_NO_AGENCY}
-            WHERE victim_sex IS NOT NULL
-            GROUP BY victim_sex ORDER BY count DESC
-        """)
-        if not sex_df.empty:
+        if sex_df.num_rows:
             fig = px.pie(sex_df, values="count", names="victim_sex",
                          color_discrete_sequence=px.colors.qualitative.Set2)
             st.plotly_chart(fig, use_container_width=True)
 
     with col4:
         st.markdown("**Victim Category by Year**")
-        vic_trend = query(f"""
-            SELECT year, crime_against, SUM(count) AS count
-            FROM '{_AGG}/victim_demographics.parquet' {WHERE_NO_AGENCY}
-            GROUP BY year, crime_against
-            ORDER BY year
-        """)
-        if not vic_trend.empty:
+        if vic_trend.num_rows:
             fig = px.line(vic_trend, x="year", y="count", color="crime_against")
             fig.update_layout(xaxis_title="Year", yaxis_title="Victims")
             st.plotly_chart(fig, use_container_width=True)
 
     # Domestic violence trends
     st.subheader("Domestic Violence Trends by Agency")
-    dv_where = _where_clause(has_crime_against=False)
-    if selected_agencies:
-        # DV table uses "agency" not "agency_short"
-        escaped = ", ".join(f"'{a.replace(chr(39), chr(39)*2)}'" for a in selected_agencies)
-        dv_where = dv_where.replace("agency_short IN", "agency IN") if "agency_short IN" in dv_where else dv_where
-    dv_df = query(f"""
-        SELECT agency, month_start, SUM(count) AS count
-        FROM '{_AGG}/domestic_violence.parquet' {dv_where}
-        GROUP BY agency, month_start
-        ORDER BY month_start
-    """)
-    if not dv_df.empty:
-        dv_df["month_start"] = pd.to_datetime(dv_df["month_start"])
+    if dv_df.num_rows:
         fig = px.line(dv_df, x="month_start", y="count", color="agency")
         fig.update_layout(xaxis_title="Month", yaxis_title="DV Incidents")
         st.plotly_chart(fig, use_container_width=True)
@@ -672,14 +816,7 @@ with tab_equity:
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("**Highest Crime ZIPs**")
-        high_zips = query(f"""
-            SELECT zip_code, city, SUM(count) AS count
-            FROM '{_AGG}/crime_by_zip.parquet' {WHERE_NO_AGENCY}
-            GROUP BY zip_code, city
-            ORDER BY count DESC LIMIT 10
-        """)
-        if not high_zips.empty:
-            high_zips["label"] = high_zips["zip_code"] + " (" + high_zips["city"].fillna("") + ")"
+        if high_zips.num_rows:
             fig = px.bar(high_zips, x="count", y="label", orientation="h",
                          color_discrete_sequence=[CHART_COLOR])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="")
@@ -687,15 +824,7 @@ with tab_equity:
 
     with col2:
         st.markdown("**Lowest Crime ZIPs**")
-        low_zips = query(f"""
-            SELECT zip_code, city, SUM(count) AS count
-            FROM '{_AGG}/crime_by_zip.parquet' {WHERE_NO_AGENCY}
-            GROUP BY zip_code, city
-            HAVING SUM(count) >= 10
-            ORDER BY count ASC LIMIT 10
-        """)
-        if not low_zips.empty:
-            low_zips["label"] = low_zips["zip_code"] + " (" + low_zips["city"].fillna("") + ")"
+        if low_zips.num_rows:
             fig = px.bar(low_zips, x="count", y="label", orientation="h",
                          color_discrete_sequence=["#2a6496"])
             fig.update_layout(yaxis=dict(autorange="reversed"), yaxis_title="")
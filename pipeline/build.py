@@ -19,11 +19,14 @@ def main() -> None:
     print("=" * 60)
 
     print("\n── Step 1: Ingest ──")
+    t = time.time()
     paths = ingest(force=force)
-    print(f"  {len(paths)} files ready\n")
+    print(f"  {len(paths)} files ready in {time.time() - t:.1f}s\n")
 
     print("── Step 2: Transform ──")
+    t = time.time()
     transform()
+    print(f"\n  transform finished in {time.time() - t:.1f}s")
 
     print("\n── Step 3: Validate ──")
     validate()
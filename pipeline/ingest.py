@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
-import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import httpx
+import orjson
 
 RAW_DIR = Path(__file__).resolve().parent.parent / "data" / "raw"
 CURRENT_YEAR = datetime.now().year
@@ -16,6 +19,7 @@ SODA_BASE = "https://opendata.sandag.org/resource"
 GROUP_A_ID = "7sps-5pd9"
 GROUP_B_ID = "huzf-mi2z"
 SODA_PAGE_SIZE = 50_000
+SODA_PROGRESS_EVERY = 10  # pages between progress lines
 
 # Group B: only these offense codes (exclude "All Other Offenses" catch-all)
 GROUP_B_CODES = ("90D", "90C", "90B", "90E")  # DUI, disorderly, trespass, vagrancy
@@ -30,23 +34,37 @@ CFS_REF_FILES = {
 CFS_DISPO_BASE = "https://seshat.datasd.org/pd"
 
 
+def _log(msg: str) -> None:
+    """Print one line with a single write, so concurrent downloads don't splice lines."""
+    sys.stdout.write(msg + "\n")
+
+
 def _soda_fetch(
+    client: httpx.Client,
     dataset_id: str,
     out_path: Path,
     where: str | None = None,
     *,
     force: bool = False,
 ) -> Path:
-    """Paginate a SODA API dataset and save as JSON."""
+    """Paginate a SODA API dataset and save as newline-delimited JSON.
+
+    Each page is appended to the file as it arrives, so memory stays at one
+    page rather than the whole dataset.
+    """
     if out_path.exists() and not force:
-        print(f"  cached: {out_path.name}")
+        _log(f"  cached: {out_path.name}")
         return out_path
 
     url = f"{SODA_BASE}/{dataset_id}.json"
-    all_rows: list[dict] = []
+    n_rows = 0
     offset = 0
 
-    with httpx.Client(timeout=300, follow_redirects=True) as client:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    # Renamed into place only after the last page, so a failed run never
+    # leaves a truncated file that looks cached
+    part = out_path.with_name(out_path.name + ".part")
+    with open(part, "wb") as f:
         while True:
             params: dict[str, str | int] = {
                 "$limit": SODA_PAGE_SIZE,
@@ -56,97 +74,103 @@ def _soda_fetch(
             if where:
                 params["$where"] = where
 
-            print(f"  fetching offset={offset} ...", end=" ", flush=True)
             resp = client.get(url, params=params)
             resp.raise_for_status()
-            batch = resp.json()
-            print(f"{len(batch)} rows")
+            batch = orjson.loads(resp.content)
 
             if not batch:
                 break
-            all_rows.extend(batch)
+            f.writelines(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in batch)
+            n_rows += len(batch)
             if len(batch) < SODA_PAGE_SIZE:
                 break
             offset += SODA_PAGE_SIZE
+            if offset // SODA_PAGE_SIZE % SODA_PROGRESS_EVERY == 0:
+                _log(f"  {out_path.name}: {n_rows:,} rows so far")
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(all_rows))
-    print(f"  saved {len(all_rows)} rows -> {out_path.name}")
+    part.replace(out_path)
+    _log(f"  saved {n_rows:,} rows -> {out_path.name}")
     return out_path
 
 
-def _csv_download(url: str, out_path: Path, *, force: bool = False) -> Path | None:
-    """Stream-download a CSV file. Returns None on 403 (future year)."""
+def _csv_download(client: httpx.Client, url: str, out_path: Path, *, force: bool = False) -> Path | None:
+    """Stream-download a CSV file, resuming an interrupted one. Returns None on 403 (future year)."""
     if out_path.exists() and not force:
-        print(f"  cached: {out_path.name}")
+        _log(f"  cached: {out_path.name}")
         return out_path
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    # Bytes land in .part and are renamed only once complete; .validator keeps
+    # the ETag/Last-Modified the partial was downloaded against
+    part = out_path.with_name(out_path.name + ".part")
+    validator = out_path.with_name(out_path.name + ".part.validator")
+    headers = {}
+    if part.exists() and validator.exists():
+        # If-Range: the server honours the Range only while the file is
+        # unchanged, otherwise it sends a full 200 that overwrites the partial
+        headers = {"Range": f"bytes={part.stat().st_size}-", "If-Range": validator.read_text()}
     try:
-        with httpx.stream("GET", url, follow_redirects=True, timeout=300) as r:
+        with client.stream("GET", url, headers=headers) as r:
             r.raise_for_status()
-            with open(out_path, "wb") as f:
+            resumed = r.status_code == 206
+            if not resumed:
+                tag = r.headers.get("etag") or r.headers.get("last-modified")
+                if tag:
+                    validator.write_text(tag)
+                else:
+                    validator.unlink(missing_ok=True)
+            with open(part, "ab" if resumed else "wb") as f:
                 for chunk in r.iter_bytes(chunk_size=1 << 20):
                     f.write(chunk)
-        size_mb = out_path.stat().st_size / (1 << 20)
-        print(f"  downloaded: {out_path.name} ({size_mb:.1f} MB)")
-        return out_path
     except httpx.HTTPStatusError as exc:
         if exc.response.status_code == 403:
-            print(f"  skipped (403): {out_path.name}")
+            _log(f"  skipped (403): {out_path.name}")
             return None
-        raise
+        # 416 under If-Range: the partial already holds the whole, unchanged file
+        if exc.response.status_code != 416:
+            raise
+        resumed = True
+
+    part.replace(out_path)
+    validator.unlink(missing_ok=True)
+    size_mb = out_path.stat().st_size / (1 << 20)
+    _log(f"  downloaded: {out_path.name} ({size_mb:.1f} MB{', resumed' if resumed else ''})")
+    return out_path
 
 
 def ingest(force: bool = False) -> list[Path]:
-    """Download all data sources. Returns list of downloaded file paths."""
-    paths: list[Path] = []
-
-    # ── Group A: CIBRS incidents ──
-    print("\n  CIBRS Group A (incidents):")
-    p = _soda_fetch(
-        GROUP_A_ID,
-        RAW_DIR / "cibrs_group_a.json",
-        force=force,
-    )
-    paths.append(p)
-
-    # ── Group B: CIBRS arrests (filtered) ──
-    print("\n  CIBRS Group B (arrests):")
+    """Download all data sources concurrently. Returns list of downloaded file paths."""
+    # One pooled client for every request, so SODA pages and the CFS files
+    # reuse keep-alive connections instead of a TLS handshake per file;
+    # httpx's default pool (100 connections) has room for one per file
+    client = httpx.Client(timeout=300, follow_redirects=True)
+
+    # Group B: CIBRS arrests, filtered to the offense codes we keep
     codes = " OR ".join(f"offense_code='{c}'" for c in GROUP_B_CODES)
-    p = _soda_fetch(
-        GROUP_B_ID,
-        RAW_DIR / "cibrs_group_b.json",
-        where=codes,
-        force=force,
-    )
-    paths.append(p)
-
-    # ── Calls for Service CSVs ──
-    print("\n  Calls for Service:")
+    jobs = [
+        partial(_soda_fetch, client, GROUP_A_ID, RAW_DIR / "cibrs_group_a.ndjson", force=force),
+        partial(_soda_fetch, client, GROUP_B_ID, RAW_DIR / "cibrs_group_b.ndjson", where=codes, force=force),
+    ]
+
+    # Calls for Service CSVs
     for year in CFS_YEARS:
         url = f"{CFS_BASE}/pd_calls_for_service_{year}_datasd.csv"
-        out = RAW_DIR / f"cfs_{year}.csv"
-        p = _csv_download(url, out, force=force)
-        if p:
-            paths.append(p)
+        jobs.append(partial(_csv_download, client, url, RAW_DIR / f"cfs_{year}.csv", force=force))
 
-    # ── CFS reference files ──
-    print("\n  CFS reference files:")
+    # CFS reference files
     for remote_name, local_name in CFS_REF_FILES.items():
         if remote_name.startswith("pd_dispo"):
             url = f"{CFS_DISPO_BASE}/{remote_name}"
         else:
             url = f"{CFS_BASE}/{remote_name}"
-        out = RAW_DIR / local_name
-        p = _csv_download(url, out, force=force)
-        if p:
-            paths.append(p)
+        jobs.append(partial(_csv_download, client, url, RAW_DIR / local_name, force=force))
 
-    return paths
+    # Every download is network-bound and independent: give each its own
+    # thread so wall time is the slowest file, not the sum of batches
+    with client, ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(lambda job: job(), jobs))
+    return [p for p in results if p]
 
 
 if __name__ == "__main__":
-    import sys
-
     ingest(force="--force" in sys.argv)
@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import duckdb
@@ -10,142 +14,188 @@ RAW_DIR = Path(__file__).resolve().parent.parent / "data" / "raw"
 PROCESSED_DIR = Path(__file__).resolve().parent.parent / "data" / "processed"
 AGGREGATED_DIR = Path(__file__).resolve().parent.parent / "data" / "aggregated"
 
+# Aggregation exports in flight at once; each already runs multi-threaded
+_EXPORT_WORKERS = 4
+
+# The processed files are the largest writes but stay local and are only
+# re-read by validate, so they trade size for speed. The aggregations keep
+# the default level 3: they are committed and served, and level 1 made
+# them ~20% larger for a few percent less write time.
+_PROCESSED_ZSTD_LEVEL = 1
+
 _SD_LAT_MIN, _SD_LAT_MAX = 32.5, 33.3
 _SD_LNG_MIN, _SD_LNG_MAX = -117.7, -116.8
 
-# Agency short-name mapping (agency field is city name like "SAN DIEGO")
-_AGENCY_CASE = """
+# Agency short-name mapping (agency field is city name like "SAN DIEGO"),
+# registered once per connection and shared by the crime and arrests tracks.
+# Only the sheriff names need a substring test; every other agency is an
+# exact match on the upper-cased name, which is one equality per row rather
+# than a chain of case-folding ILIKE scans
+_AGENCY_MACRO = """
+    CREATE OR REPLACE MACRO to_agency_short(agency) AS
     CASE
-        WHEN agency ILIKE 'SAN DIEGO' THEN 'SDPD'
-        WHEN agency ILIKE '%SHERIFF%' OR agency ILIKE '%SD COUNTY%' THEN 'SDSO'
-        WHEN agency ILIKE 'CHULA VISTA' THEN 'CVPD'
-        WHEN agency ILIKE 'OCEANSIDE' THEN 'OPD'
-        WHEN agency ILIKE 'ESCONDIDO' THEN 'EPD'
-        WHEN agency ILIKE 'CARLSBAD' THEN 'CPD'
-        WHEN agency ILIKE 'EL CAJON' THEN 'ECPD'
-        WHEN agency ILIKE 'NATIONAL CITY' THEN 'NCPD'
-        WHEN agency ILIKE 'LA MESA' THEN 'LMPD'
-        WHEN agency ILIKE 'CORONADO' THEN 'CoronPD'
-        WHEN agency ILIKE 'VISTA' THEN 'VPD'
-        ELSE UPPER(REPLACE(agency, ' ', ''))
+        WHEN contains(UPPER(agency), 'SHERIFF') OR contains(UPPER(agency), 'SD COUNTY') THEN 'SDSO'
+        ELSE CASE UPPER(agency)
+            WHEN 'SAN DIEGO' THEN 'SDPD'
+            WHEN 'CHULA VISTA' THEN 'CVPD'
+            WHEN 'OCEANSIDE' THEN 'OPD'
+            WHEN 'ESCONDIDO' THEN 'EPD'
+            WHEN 'CARLSBAD' THEN 'CPD'
+            WHEN 'EL CAJON' THEN 'ECPD'
+            WHEN 'NATIONAL CITY' THEN 'NCPD'
+            WHEN 'LA MESA' THEN 'LMPD'
+            WHEN 'CORONADO' THEN 'CoronPD'
+            WHEN 'VISTA' THEN 'VPD'
+            ELSE UPPER(REPLACE(agency, ' ', ''))
+        END
     END
 """
 
 
-def _export(con: duckdb.DuckDBPyConnection, sql: str, path: Path) -> int:
-    """Run COPY ... TO parquet ZSTD. Returns row count."""
+def _log(msg: str) -> None:
+    """Print one line with a single write.
+
+    print() writes the text and the newline separately, which splices lines
+    together when the tracks and exports run on concurrent threads.
+    """
+    sys.stdout.write(msg + "\n")
+
+
+def _export(con: duckdb.DuckDBPyConnection, sql: str, path: Path, *, level: int = 3) -> int:
+    """Run COPY ... TO parquet ZSTD at the given level. Returns row count."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    con.execute(f"COPY ({sql}) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD)")
-    count = con.execute(f"SELECT COUNT(*) FROM '{path}'").fetchone()[0]
+    # COPY reports the rows it wrote, so the file isn't reopened to count them
+    count = con.execute(
+        f"COPY ({sql}) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD, COMPRESSION_LEVEL {level})"
+    ).fetchone()[0]
     size_mb = path.stat().st_size / (1 << 20)
-    print(f"    {path.name}: {count:,} rows ({size_mb:.1f} MB)")
+    _log(f"    {path.name}: {count:,} rows ({size_mb:.1f} MB)")
     return count
 
 
+def _export_all(con: duckdb.DuckDBPyConnection, exports: list[tuple[str, Path]]) -> None:
+    """Run independent exports concurrently, each on its own cursor.
+
+    DuckDB schedules every connection's work on one shared thread pool, so
+    overlapping exports keeps cores busy while another export is writing or
+    finishing a single-threaded phase, without oversubscribing the CPU.
+    """
+    def run(export: tuple[str, Path]) -> None:
+        with con.cursor() as cur:
+            _export(cur, *export)
+
+    with ThreadPoolExecutor(max_workers=_EXPORT_WORKERS) as pool:
+        list(pool.map(run, exports))
+
+
 # ── Track 1: CIBRS Group A -> crime.parquet ──────────────────────────────
 
 def _transform_crime(con: duckdb.DuckDBPyConnection) -> None:
     """Process CIBRS Group A incidents."""
-    src = RAW_DIR / "cibrs_group_a.json"
+    src = RAW_DIR / "cibrs_group_a.ndjson"
     dest = PROCESSED_DIR / "crime.parquet"
-    print("\n  Track 1: CIBRS Group A -> crime.parquet")
+    _log("\n  Track 1: CIBRS Group A -> crime.parquet")
 
+    # A view, not a table: the NDJSON is scanned straight into the dedup
+    # below instead of first being copied whole into memory
     con.execute(f"""
-        CREATE OR REPLACE TABLE raw_crime AS
-        SELECT * FROM read_json('{src}', auto_detect=true, format='array')
+        CREATE OR REPLACE VIEW raw_crime AS
+        SELECT * FROM read_json('{src}', auto_detect=true, format='newline_delimited')
     """)
 
+    # The inner SELECT parses the date string once per row; the derived
+    # date parts and the dedup ordering all reuse _date / _ts. in_sd_bbox
+    # flags coordinates inside the county box, so map_points filters on one
+    # stored column instead of re-testing lat/lng. It is built from _lat /
+    # _lng because a bare lat would bind to a raw column of that name first
     con.execute(f"""
         CREATE OR REPLACE TABLE crime AS
-        SELECT * EXCLUDE (_rn) FROM (
-            SELECT
-                incidentuid,
-                TRY_CAST(incident_date AS DATE) AS incident_date,
-                YEAR(TRY_CAST(incident_date AS DATE)) AS year,
-                MONTH(TRY_CAST(incident_date AS DATE)) AS month,
-                QUARTER(TRY_CAST(incident_date AS DATE)) AS quarter,
-                DAYOFWEEK(TRY_CAST(incident_date AS DATE)) AS dow,
-                DATE_TRUNC('month', TRY_CAST(incident_date AS DATE)) AS month_start,
-                agency,
-                {_AGENCY_CASE} AS agency_short,
-                crime_against_category AS crime_against,
-                cibrs_grouped_offense_description AS offense_group,
-                cibrs_offense_description AS offense_description,
-                TRY_CAST(victim_age AS INT) AS victim_age,
-                victim_race,
-                victim_sex,
-                zip_code,
-                city,
-                COALESCE(domestic_violence_incident, false) AS is_domestic_violence,
-                CASE WHEN TRY_CAST(stolen_vehicles AS INT) > 0 THEN true
-                     WHEN LOWER(cibrs_offense_description) LIKE '%motor vehicle theft%' THEN true
-                     ELSE false END AS is_stolen_vehicle,
-                TRY_CAST(location.coordinates[2] AS DOUBLE) AS lat,
-                TRY_CAST(location.coordinates[1] AS DOUBLE) AS lng,
-                ROW_NUMBER() OVER (
-                    PARTITION BY incidentuid, cibrs_offense_description
-                    ORDER BY TRY_CAST(incident_date AS TIMESTAMP) DESC NULLS LAST
-                ) AS _rn
+        SELECT
+            incidentuid,
+            _date AS incident_date,
+            YEAR(_date) AS year,
+            MONTH(_date) AS month,
+            QUARTER(_date) AS quarter,
+            DAYOFWEEK(_date) AS dow,
+            DATE_TRUNC('month', _date) AS month_start,
+            agency,
+            to_agency_short(agency) AS agency_short,
+            crime_against_category AS crime_against,
+            cibrs_grouped_offense_description AS offense_group,
+            cibrs_offense_description AS offense_description,
+            TRY_CAST(victim_age AS INT) AS victim_age,
+            victim_race,
+            victim_sex,
+            zip_code,
+            city,
+            COALESCE(domestic_violence_incident, false) AS is_domestic_violence,
+            CASE WHEN TRY_CAST(stolen_vehicles AS INT) > 0 THEN true
+                 WHEN LOWER(cibrs_offense_description) LIKE '%motor vehicle theft%' THEN true
+                 ELSE false END AS is_stolen_vehicle,
+            _lat AS lat,
+            _lng AS lng,
+            _lat BETWEEN {_SD_LAT_MIN} AND {_SD_LAT_MAX}
+                AND _lng BETWEEN {_SD_LNG_MIN} AND {_SD_LNG_MAX} AS in_sd_bbox
+        FROM (
+            SELECT *,
+                   TRY_CAST(incident_date AS DATE) AS _date,
+                   TRY_CAST(incident_date AS TIMESTAMP) AS _ts,
+                   TRY_CAST(location.coordinates[2] AS DOUBLE) AS _lat,
+                   TRY_CAST(location.coordinates[1] AS DOUBLE) AS _lng
             FROM raw_crime
         )
-        WHERE _rn = 1
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY incidentuid, cibrs_offense_description
+            ORDER BY _ts DESC NULLS LAST
+        ) = 1
     """)
 
-    count = _export(con, "SELECT * FROM crime", dest)
-    print(f"    -> {count:,} deduplicated incidents")
+    count = _export(con, "SELECT * FROM crime", dest, level=_PROCESSED_ZSTD_LEVEL)
+    _log(f"    -> {count:,} deduplicated incidents")
 
 
 # ── Track 2: CIBRS Group B -> arrests.parquet ───────────────────────────
 
 def _transform_arrests(con: duckdb.DuckDBPyConnection) -> None:
     """Process CIBRS Group B arrests."""
-    src = RAW_DIR / "cibrs_group_b.json"
+    src = RAW_DIR / "cibrs_group_b.ndjson"
     dest = PROCESSED_DIR / "arrests.parquet"
-    print("\n  Track 2: CIBRS Group B -> arrests.parquet")
+    _log("\n  Track 2: CIBRS Group B -> arrests.parquet")
 
     con.execute(f"""
-        CREATE OR REPLACE TABLE raw_arrests AS
-        SELECT * FROM read_json('{src}', auto_detect=true, format='array')
+        CREATE OR REPLACE VIEW raw_arrests AS
+        SELECT * FROM read_json('{src}', auto_detect=true, format='newline_delimited')
     """)
 
     con.execute(f"""
         CREATE OR REPLACE TABLE arrests AS
         SELECT
             incident_uid AS incidentuid,
-            TRY_CAST(arrest_date AS DATE) AS incident_date,
-            YEAR(TRY_CAST(arrest_date AS DATE)) AS year,
-            MONTH(TRY_CAST(arrest_date AS DATE)) AS month,
-            QUARTER(TRY_CAST(arrest_date AS DATE)) AS quarter,
-            DAYOFWEEK(TRY_CAST(arrest_date AS DATE)) AS dow,
-            DATE_TRUNC('month', TRY_CAST(arrest_date AS DATE)) AS month_start,
+            _date AS incident_date,
+            YEAR(_date) AS year,
+            MONTH(_date) AS month,
+            QUARTER(_date) AS quarter,
+            DAYOFWEEK(_date) AS dow,
+            DATE_TRUNC('month', _date) AS month_start,
             arrest_agency AS agency,
-            CASE
-                WHEN arrest_agency ILIKE 'SAN DIEGO' THEN 'SDPD'
-                WHEN arrest_agency ILIKE '%SHERIFF%' OR arrest_agency ILIKE '%SD COUNTY%' THEN 'SDSO'
-                WHEN arrest_agency ILIKE 'CHULA VISTA' THEN 'CVPD'
-                WHEN arrest_agency ILIKE 'OCEANSIDE' THEN 'OPD'
-                WHEN arrest_agency ILIKE 'ESCONDIDO' THEN 'EPD'
-                WHEN arrest_agency ILIKE 'CARLSBAD' THEN 'CPD'
-                WHEN arrest_agency ILIKE 'EL CAJON' THEN 'ECPD'
-                WHEN arrest_agency ILIKE 'NATIONAL CITY' THEN 'NCPD'
-                WHEN arrest_agency ILIKE 'LA MESA' THEN 'LMPD'
-                WHEN arrest_agency ILIKE 'CORONADO' THEN 'CoronPD'
-                WHEN arrest_agency ILIKE 'VISTA' THEN 'VPD'
-                ELSE UPPER(REPLACE(arrest_agency, ' ', ''))
-            END AS agency_short,
+            to_agency_short(arrest_agency) AS agency_short,
             offense_code,
             offense_description
-        FROM raw_arrests
+        FROM (SELECT *, TRY_CAST(arrest_date AS DATE) AS _date FROM raw_arrests)
     """)
 
-    count = _export(con, "SELECT * FROM arrests", dest)
-    print(f"    -> {count:,} arrest records")
+    count = _export(con, "SELECT * FROM arrests", dest, level=_PROCESSED_ZSTD_LEVEL)
+    _log(f"    -> {count:,} arrest records")
 
 
 # ── Track 3: CFS -> cfs.parquet ─────────────────────────────────────────
 
 def _load_cfs_reference_tables(con: duckdb.DuckDBPyConnection) -> tuple[bool, bool]:
-    """Load CFS reference CSVs if they exist. Returns (has_call_type, has_dispo)."""
+    """Load CFS reference CSVs if they exist. Returns (has_call_type, has_dispo).
+
+    Each table keeps one row per code, so a code repeated in a CSV can't
+    fan out the calls joined to it.
+    """
     call_type_csv = RAW_DIR / "call_type_desc.csv"
     dispo_csv = RAW_DIR / "dispo_code_desc.csv"
 
@@ -155,45 +205,66 @@ def _load_cfs_reference_tables(con: duckdb.DuckDBPyConnection) -> tuple[bool, bo
     if call_type_csv.exists():
         con.execute(f"""
             CREATE OR REPLACE TABLE ref_call_type AS
-            SELECT * FROM read_csv('{call_type_csv}', header=true, auto_detect=true)
+            SELECT CALL_TYPE, ANY_VALUE(DESCRIPTION) AS DESCRIPTION
+            FROM read_csv('{call_type_csv}', header=true, auto_detect=true)
+            GROUP BY CALL_TYPE
         """)
         has_call_type = True
         count = con.execute("SELECT COUNT(*) FROM ref_call_type").fetchone()[0]
-        print(f"    loaded ref_call_type: {count} rows")
+        _log(f"    loaded ref_call_type: {count} rows")
 
     if dispo_csv.exists():
         con.execute(f"""
             CREATE OR REPLACE TABLE ref_dispo AS
-            SELECT * FROM read_csv('{dispo_csv}', header=true, auto_detect=true)
+            SELECT DISPO_CODE, ANY_VALUE(DESCRIPTION) AS DESCRIPTION
+            FROM read_csv('{dispo_csv}', header=true, auto_detect=true)
+            GROUP BY DISPO_CODE
         """)
         has_dispo = True
         count = con.execute("SELECT COUNT(*) FROM ref_dispo").fetchone()[0]
-        print(f"    loaded ref_dispo: {count} rows")
+        _log(f"    loaded ref_dispo: {count} rows")
 
     return has_call_type, has_dispo
 
 
+def _stage_cfs_csv(con: duckdb.DuckDBPyConnection, csv: Path) -> Path:
+    """Convert one yearly CFS CSV to parquet next to it. Returns the parquet path.
+
+    The copy is reused while it is newer than the CSV, so a rerun only parses
+    the years ingest downloaded again.
+    """
+    staged = csv.with_suffix(".parquet")
+    if staged.exists() and staged.stat().st_mtime >= csv.stat().st_mtime:
+        return staged
+    # Renamed into place once written, so an interrupted run can't leave a
+    # truncated file that looks newer than its CSV
+    part = staged.with_name(staged.name + ".part")
+    con.execute(f"""
+        COPY (SELECT * FROM read_csv('{csv}', header = true, ignore_errors = true))
+        TO '{part}' (FORMAT PARQUET, COMPRESSION ZSTD, COMPRESSION_LEVEL {_PROCESSED_ZSTD_LEVEL})
+    """)
+    part.replace(staged)
+    _log(f"    staged {csv.name} -> {staged.name}")
+    return staged
+
+
 def _transform_cfs(con: duckdb.DuckDBPyConnection) -> None:
     """Process Calls for Service CSVs."""
     dest = PROCESSED_DIR / "cfs.parquet"
-    print("\n  Track 3: CFS -> cfs.parquet")
+    _log("\n  Track 3: CFS -> cfs.parquet")
 
     csv_files = sorted(RAW_DIR.glob("cfs_*.csv"))
     if not csv_files:
-        print("    WARNING: no CFS CSV files found, skipping")
+        _log("    WARNING: no CFS CSV files found, skipping")
         return
 
-    csv_list = ", ".join(f"'{f}'" for f in csv_files)
-
+    # Each year is parsed from CSV once and kept as parquet; union_by_name
+    # then lines up the yearly column sets from the parquet footers alone.
+    # A view, as for raw_crime: the dedup below is its only reader
+    staged = ", ".join(f"'{_stage_cfs_csv(con, f)}'" for f in csv_files)
     con.execute(f"""
-        CREATE OR REPLACE TABLE raw_cfs AS
-        SELECT * FROM read_csv(
-            [{csv_list}],
-            header = true,
-            ignore_errors = true,
-            union_by_name = true,
-            filename = true
-        )
+        CREATE OR REPLACE VIEW raw_cfs AS
+        SELECT * FROM read_parquet([{staged}], union_by_name = true)
     """)
 
     # Load reference tables for human-readable descriptions
@@ -218,91 +289,118 @@ def _transform_cfs(con: duckdb.DuckDBPyConnection) -> None:
         dispo_join = ""
 
     # CFS columns are uppercase: INCIDENT_NUM, DATE_TIME, CALL_TYPE, etc.
+    # DATE_TIME is parsed once per row into _ts / _date, as in the crime track.
+    # The dedup runs on raw_cfs alone and the reference joins apply to its
+    # output, so they probe one row per call rather than every raw row
     con.execute(f"""
         CREATE OR REPLACE TABLE cfs_dedup AS
-        SELECT * EXCLUDE (_rn) FROM (
-            SELECT
-                cfs_raw.INCIDENT_NUM AS incident_num,
-                TRY_CAST(cfs_raw.DATE_TIME AS TIMESTAMP) AS call_timestamp,
-                TRY_CAST(cfs_raw.DATE_TIME AS DATE) AS call_date,
-                YEAR(TRY_CAST(cfs_raw.DATE_TIME AS DATE)) AS year,
-                MONTH(TRY_CAST(cfs_raw.DATE_TIME AS DATE)) AS month,
-                DAYOFWEEK(TRY_CAST(cfs_raw.DATE_TIME AS DATE)) AS dow,
-                HOUR(TRY_CAST(cfs_raw.DATE_TIME AS TIMESTAMP)) AS hour,
-                DATE_TRUNC('month', TRY_CAST(cfs_raw.DATE_TIME AS DATE)) AS month_start,
-                cfs_raw.CALL_TYPE AS call_type,
-                {call_type_expr} AS call_type_desc,
-                TRY_CAST(cfs_raw.PRIORITY AS INT) AS priority,
-                cfs_raw.DISPOSITION AS disposition,
-                {dispo_expr} AS dispo_desc,
-                TRY_CAST(cfs_raw.BEAT AS VARCHAR) AS beat,
-                ROW_NUMBER() OVER (
-                    PARTITION BY cfs_raw.INCIDENT_NUM
-                    ORDER BY TRY_CAST(cfs_raw.DATE_TIME AS TIMESTAMP) DESC NULLS LAST
-                ) AS _rn
-            FROM raw_cfs cfs_raw
-            {call_type_join}
-            {dispo_join}
-        )
-        WHERE _rn = 1
+        SELECT
+            cfs_raw.INCIDENT_NUM AS incident_num,
+            cfs_raw._ts AS call_timestamp,
+            cfs_raw._date AS call_date,
+            YEAR(cfs_raw._date) AS year,
+            MONTH(cfs_raw._date) AS month,
+            DAYOFWEEK(cfs_raw._date) AS dow,
+            HOUR(cfs_raw._ts) AS hour,
+            DATE_TRUNC('month', cfs_raw._date) AS month_start,
+            cfs_raw.CALL_TYPE AS call_type,
+            {call_type_expr} AS call_type_desc,
+            TRY_CAST(cfs_raw.PRIORITY AS INT) AS priority,
+            cfs_raw.DISPOSITION AS disposition,
+            {dispo_expr} AS dispo_desc,
+            TRY_CAST(cfs_raw.BEAT AS VARCHAR) AS beat
+        FROM (
+            SELECT *,
+                   TRY_CAST(DATE_TIME AS TIMESTAMP) AS _ts,
+                   TRY_CAST(DATE_TIME AS DATE) AS _date
+            FROM raw_cfs
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY INCIDENT_NUM
+                ORDER BY _ts DESC NULLS LAST
+            ) = 1
+        ) cfs_raw
+        {call_type_join}
+        {dispo_join}
     """)
 
-    count = _export(con, "SELECT * FROM cfs_dedup", dest)
-    print(f"    -> {count:,} deduplicated calls")
+    count = _export(con, "SELECT * FROM cfs_dedup", dest, level=_PROCESSED_ZSTD_LEVEL)
+    _log(f"    -> {count:,} deduplicated calls")
 
 
 # ── Aggregations ────────────────────────────────────────────────────────
 
+def _source(con: duckdb.DuckDBPyConnection, table: str, path: Path) -> str | None:
+    """FROM target for one dataset: this run's table, else an earlier run's parquet."""
+    if con.execute("SELECT 1 FROM duckdb_tables() WHERE table_name = ?", [table]).fetchone():
+        return table
+    if path.exists():
+        return f"'{path}'"
+    return None
+
+
 def _build_aggregations(con: duckdb.DuckDBPyConnection) -> None:
-    """Build all 14 aggregation parquet files."""
-    print("\n  Building aggregations:")
+    """Build all 17 aggregation parquet files.
+
+    The two multi-row-group files (map_points, cfs_by_beat) are left unsorted:
+    their only readers are the map_grid / cfs_*_priority roll-ups, which scan
+    them in full. The roll-ups that are served are written in year order and
+    the time series keep month order; the other files are unsorted, since
+    every reader groups and orders them itself.
+
+    Exports are independent, so they run concurrently; the roll-ups read
+    files written by the first batch and run once it has finished. Each
+    dataset is read from the in-memory table its track just built, so the
+    processed parquet isn't decoded again for every export.
+    """
+    _log("\n  Building aggregations:")
+
+    # (sql, dest) pairs for _export_all
+    exports: list[tuple[str, Path]] = []
+    rollups: list[tuple[str, Path]] = []
 
-    crime_path = PROCESSED_DIR / "crime.parquet"
-    arrests_path = PROCESSED_DIR / "arrests.parquet"
-    cfs_path = PROCESSED_DIR / "cfs.parquet"
+    crime = _source(con, "crime", PROCESSED_DIR / "crime.parquet")
+    arrests = _source(con, "arrests", PROCESSED_DIR / "arrests.parquet")
+    cfs = _source(con, "cfs_dedup", PROCESSED_DIR / "cfs.parquet")
 
     # ── Crime aggregations (Group A) ──
-    if crime_path.exists():
-        C = f"'{crime_path}'"
+    if crime:
+        C = crime
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT month_start, agency_short, crime_against,
                    COUNT(*) AS total_incidents
             FROM {C}
             WHERE month_start IS NOT NULL
             GROUP BY month_start, agency_short, crime_against
             ORDER BY month_start
-        """, AGGREGATED_DIR / "crime_overview_monthly.parquet")
+        """, AGGREGATED_DIR / "crime_overview_monthly.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT offense_group, offense_description, crime_against, year,
                    COUNT(*) AS count
             FROM {C}
             WHERE year IS NOT NULL
             GROUP BY offense_group, offense_description, crime_against, year
-            ORDER BY count DESC
-        """, AGGREGATED_DIR / "crime_by_type.parquet")
+        """, AGGREGATED_DIR / "crime_by_type.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT zip_code, city, year, crime_against,
                    COUNT(*) AS count
             FROM {C}
             WHERE zip_code IS NOT NULL AND year IS NOT NULL
             GROUP BY zip_code, city, year, crime_against
-            ORDER BY count DESC
-        """, AGGREGATED_DIR / "crime_by_zip.parquet")
+        """, AGGREGATED_DIR / "crime_by_zip.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT agency_short, year, crime_against,
                    COUNT(*) AS count,
                    SUM(CASE WHEN is_domestic_violence THEN 1 ELSE 0 END) AS dv_count
             FROM {C}
             WHERE year IS NOT NULL
             GROUP BY agency_short, year, crime_against
-            ORDER BY count DESC
-        """, AGGREGATED_DIR / "crime_by_agency.parquet")
+        """, AGGREGATED_DIR / "crime_by_agency.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT
                 CASE
                     WHEN victim_age < 18 THEN 'Under 18'
@@ -319,10 +417,9 @@ def _build_aggregations(con: duckdb.DuckDBPyConnection) -> None:
             FROM {C}
             WHERE year IS NOT NULL
             GROUP BY age_bin, victim_race, victim_sex, crime_against, year
-            ORDER BY count DESC
-        """, AGGREGATED_DIR / "victim_demographics.parquet")
+        """, AGGREGATED_DIR / "victim_demographics.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT agency_short AS agency, offense_group, victim_sex,
                    year, month_start,
                    COUNT(*) AS count
@@ -330,26 +427,35 @@ def _build_aggregations(con: duckdb.DuckDBPyConnection) -> None:
             WHERE is_domestic_violence = true AND year IS NOT NULL
             GROUP BY agency_short, offense_group, victim_sex, year, month_start
             ORDER BY month_start
-        """, AGGREGATED_DIR / "domestic_violence.parquet")
+        """, AGGREGATED_DIR / "domestic_violence.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT dow, month, year, crime_against,
                    COUNT(*) AS count
             FROM {C}
             WHERE year IS NOT NULL
             GROUP BY dow, month, year, crime_against
-        """, AGGREGATED_DIR / "temporal_patterns.parquet")
+        """, AGGREGATED_DIR / "temporal_patterns.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT lat, lng, offense_group, crime_against,
                    agency_short AS agency, year, city
             FROM {C}
-            WHERE lat IS NOT NULL AND lng IS NOT NULL
-              AND lat BETWEEN {_SD_LAT_MIN} AND {_SD_LAT_MAX}
-              AND lng BETWEEN {_SD_LNG_MIN} AND {_SD_LNG_MAX}
-        """, AGGREGATED_DIR / "map_points.parquet")
+            WHERE in_sd_bbox
+        """, AGGREGATED_DIR / "map_points.parquet"))
+
+        # Dashboard map grid: map_points binned to 0.005 degree cells at the
+        # (year, crime_against) grain the map filters on
+        rollups.append((f"""
+            SELECT FLOOR(lat * 200) / 200 AS lat, FLOOR(lng * 200) / 200 AS lng,
+                   year, crime_against,
+                   COUNT(*) AS count
+            FROM '{AGGREGATED_DIR / "map_points.parquet"}'
+            GROUP BY ALL
+            ORDER BY year, crime_against
+        """, AGGREGATED_DIR / "map_grid.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT year,
                    COUNT(*) AS total,
                    SUM(CASE WHEN crime_against = 'People' THEN 1 ELSE 0 END) AS person_crimes,
@@ -361,68 +467,107 @@ def _build_aggregations(con: duckdb.DuckDBPyConnection) -> None:
             WHERE year IS NOT NULL
             GROUP BY year
             ORDER BY year
-        """, AGGREGATED_DIR / "yearly_summary.parquet")
+        """, AGGREGATED_DIR / "yearly_summary.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT city, year, crime_against,
                    COUNT(*) AS count
             FROM {C}
             WHERE city IS NOT NULL AND year IS NOT NULL
             GROUP BY city, year, crime_against
-            ORDER BY count DESC
-        """, AGGREGATED_DIR / "crime_by_city.parquet")
+        """, AGGREGATED_DIR / "crime_by_city.parquet"))
 
     # ── Arrest aggregations (Group B) ──
-    if arrests_path.exists():
-        A = f"'{arrests_path}'"
+    if arrests:
+        A = arrests
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT offense_description, agency_short, year, month_start,
                    COUNT(*) AS count
             FROM {A}
             WHERE year IS NOT NULL
             GROUP BY offense_description, agency_short, year, month_start
             ORDER BY month_start
-        """, AGGREGATED_DIR / "arrests_by_type.parquet")
+        """, AGGREGATED_DIR / "arrests_by_type.parquet"))
 
     # ── CFS aggregations ──
-    if cfs_path.exists():
-        F = f"'{cfs_path}'"
+    if cfs:
+        F = cfs
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT month_start, year, call_type_desc, priority,
                    COUNT(*) AS total_calls
             FROM {F}
             WHERE month_start IS NOT NULL
             GROUP BY month_start, year, call_type_desc, priority
             ORDER BY month_start
-        """, AGGREGATED_DIR / "cfs_monthly.parquet")
+        """, AGGREGATED_DIR / "cfs_monthly.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT beat, year, call_type_desc, priority, disposition,
                    COUNT(*) AS total_calls
             FROM {F}
             WHERE beat IS NOT NULL AND year IS NOT NULL
             GROUP BY beat, year, call_type_desc, priority, disposition
-            ORDER BY total_calls DESC
-        """, AGGREGATED_DIR / "cfs_by_beat.parquet")
+        """, AGGREGATED_DIR / "cfs_by_beat.parquet"))
 
-        _export(con, f"""
+        exports.append((f"""
             SELECT dow, hour, priority,
                    COUNT(*) AS total_calls
             FROM {F}
             WHERE dow IS NOT NULL AND hour IS NOT NULL
             GROUP BY dow, hour, priority
-        """, AGGREGATED_DIR / "cfs_temporal.parquet")
+        """, AGGREGATED_DIR / "cfs_temporal.parquet"))
+
+        # Roll-ups of the two wide CFS tables down to the (year, priority)
+        # grain the API filters on, so it doesn't GROUP BY them per request
+        rollups.append((f"""
+            SELECT month_start, year, priority,
+                   SUM(total_calls)::BIGINT AS total_calls
+            FROM '{AGGREGATED_DIR / "cfs_monthly.parquet"}'
+            GROUP BY month_start, year, priority
+            ORDER BY month_start
+        """, AGGREGATED_DIR / "cfs_monthly_priority.parquet"))
+
+        rollups.append((f"""
+            SELECT beat, year, priority,
+                   SUM(total_calls)::BIGINT AS total_calls
+            FROM '{AGGREGATED_DIR / "cfs_by_beat.parquet"}'
+            GROUP BY beat, year, priority
+            ORDER BY year
+        """, AGGREGATED_DIR / "cfs_beat_priority.parquet"))
+
+    _export_all(con, exports)
+    _export_all(con, rollups)
+
+
+def _run_track(track: Callable[[duckdb.DuckDBPyConnection], None], con: duckdb.DuckDBPyConnection) -> None:
+    """Run one transform track on its own cursor and report its wall time."""
+    t0 = time.time()
+    with con.cursor() as cur:
+        track(cur)
+    _log(f"    {track.__name__} finished in {time.time() - t0:.1f}s")
 
 
 def transform() -> None:
-    """Run all three transform tracks + aggregations."""
+    """Run the three transform tracks concurrently, then the aggregations.
+
+    The tracks read different raw files and create differently named tables,
+    so they share one database through separate cursors; DuckDB releases the
+    GIL while executing, so threads overlap the work.
+    """
     con = duckdb.connect()
     try:
-        _transform_crime(con)
-        _transform_arrests(con)
-        _transform_cfs(con)
+        # The roll-ups reopen three of the exported parquets; keep their
+        # decoded footers around
+        con.execute("SET parquet_metadata_cache = true")
+        # Row order only matters where a query says ORDER BY; without the
+        # guarantee, big scans and COPYs needn't buffer rows to keep input order
+        con.execute("SET preserve_insertion_order = false")
+        con.execute(_AGENCY_MACRO)
+        tracks = (_transform_crime, _transform_arrests, _transform_cfs)
+        with ThreadPoolExecutor(max_workers=len(tracks)) as pool:
+            list(pool.map(lambda track: _run_track(track, con), tracks))
         _build_aggregations(con)
     finally:
         con.close()
@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import pairwise
 from pathlib import Path
 
 import duckdb
@@ -15,24 +18,91 @@ SD_LNG_MIN, SD_LNG_MAX = -117.7, -116.8
 
 CURRENT_YEAR = datetime.now().year
 
-
-def _q(sql: str) -> list:
-    con = duckdb.connect()
-    try:
-        return con.execute(sql).fetchall()
-    finally:
-        con.close()
-
-
-def _scalar(sql: str):
-    rows = _q(sql)
-    return rows[0][0] if rows else None
+# One in-memory connection for every check, rather than a fresh database per
+# query; the metadata cache keeps each file's parquet footer between queries
+_CON = duckdb.connect()
+_CON.execute("SET parquet_metadata_cache = true")
+# Keep DuckDB's progress bar out of the check report
+_CON.execute("SET enable_progress_bar = false")
+
+
+# Values go in as ``?`` parameters rather than being formatted into the SQL.
+# The Python client has no reusable prepared statements, so each call still
+# plans once; that is noise next to the parquet reads. Results stay Python
+# tuples: no check fetches more than a few dozen rows, where converting
+# through Arrow costs more than it saves.
+def _q(sql: str, params: list | None = None) -> list:
+    return _CON.execute(sql, params).fetchall()
+
+
+def _row(sql: str, params: list | None = None, con: duckdb.DuckDBPyConnection = _CON) -> dict:
+    """First row of a query as a dict keyed by column name."""
+    cur = con.execute(sql, params)
+    return dict(zip([d[0] for d in cur.description], cur.fetchone()))
+
+
+def _scalar(sql: str, params: list | None = None):
+    row = _CON.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+# Per-dataset aggregates behind the row-count, range, NULL, category and
+# duplicate checks, one scan per file: (sql, params)
+_NULL_COLS = ["incident_date", "agency_short", "crime_against", "offense_group"]
+_STATS_QUERIES: dict[str, tuple[str, list]] = {
+    # Check 6 groups by agency and queries separately; Check 9 only groups by
+    # incident key when distinct_keys shows duplicate rows
+    "crime": (f"""
+        SELECT COUNT(*) AS total,
+               MIN(year) AS min_yr,
+               MAX(year) AS max_yr,
+               COUNT(*) FILTER (WHERE lat IS NOT NULL AND (
+                   lat NOT BETWEEN ? AND ? OR lng NOT BETWEEN ? AND ?
+               )) AS outliers,
+               COUNT(lat) AS total_geo,
+               {", ".join(f"COUNT(*) FILTER (WHERE {c} IS NULL) AS null_{c}" for c in _NULL_COLS)},
+               list(DISTINCT crime_against)
+                   FILTER (WHERE crime_against IS NOT NULL) AS categories,
+               histogram(year) AS per_year,
+               COUNT(DISTINCT (incidentuid, offense_description)) AS distinct_keys
+        FROM crime
+    """, [SD_LAT_MIN, SD_LAT_MAX, SD_LNG_MIN, SD_LNG_MAX]),
+    "arrests": ("""
+        SELECT COUNT(*) AS total,
+               MIN(year) AS min_yr,
+               MAX(year) AS max_yr,
+               list(DISTINCT offense_description) AS offense_types
+        FROM arrests
+    """, []),
+    "cfs": ("""
+        SELECT COUNT(*) AS total,
+               MIN(year) AS min_yr,
+               MAX(year) AS max_yr,
+               list(DISTINCT year) FILTER (WHERE year IS NOT NULL) AS years,
+               COUNT(DISTINCT beat) AS beats
+        FROM cfs
+    """, []),
+}
+
+
+def _stats(name: str) -> dict:
+    """Run one dataset's stats query on its own cursor."""
+    sql, params = _STATS_QUERIES[name]
+    with _CON.cursor() as cur:
+        return _row(sql, params, cur)
+
+
+def _file_sizes(directory: Path) -> dict[str, int]:
+    """Size in bytes of each file in a directory, from one scandir pass."""
+    if not directory.is_dir():
+        return {}
+    with os.scandir(directory) as entries:
+        return {e.name: e.stat().st_size for e in entries if e.is_file()}
 
 
 def _header(num: int, title: str) -> None:
-    print(f"\n{'─' * 64}")
-    print(f"  Check {num}: {title}")
-    print(f"{'─' * 64}")
+    rule = "─" * 64
+    print(f"\n{rule}\n  Check {num}: {title}\n{rule}")
 
 
 def validate() -> int:
@@ -44,18 +114,36 @@ def validate() -> int:
 
     # ── Check 1: File existence ──
     _header(1, "File existence")
+    processed_sizes = _file_sizes(PROCESSED_DIR)
+    # Files found here; the checks below skip any dataset missing from it
+    present: set[str] = set()
     for name, path in [("crime", crime), ("arrests", arrests), ("cfs", cfs)]:
-        if path.exists():
-            size_mb = path.stat().st_size / (1 << 20)
+        if path.name in processed_sizes:
+            # Later checks query the file through a view named after it. View
+            # DDL can't take ? parameters, so the path is quoted as a literal
+            literal = str(path).replace("'", "''")
+            _CON.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{literal}')")
+            present.add(name)
+            size_mb = processed_sizes[path.name] / (1 << 20)
             print(f"  PASS  {name}: {size_mb:.1f} MB")
         else:
             print(f"  FAIL  {name}: NOT FOUND")
             issues += 1
 
+    # Each dataset's checks read one stats row; the three scans are
+    # independent, so they run concurrently on their own cursors and the
+    # checks below only report from the rows
+    names = [name for name in _STATS_QUERIES if name in present]
+    with ThreadPoolExecutor(max_workers=len(_STATS_QUERIES)) as pool:
+        stats = dict(zip(names, pool.map(_stats, names)))
+    crime_stats = stats.get("crime")
+    arrests_stats = stats.get("arrests")
+    cfs_stats = stats.get("cfs")
+
     # ── Check 2: Crime row count ──
     _header(2, "Crime row count (expect >500K)")
-    if crime.exists():
-        count = _scalar(f"SELECT COUNT(*) FROM '{crime}'")
+    if "crime" in present:
+        count = crime_stats["total"]
         if count and count > 500_000:
             print(f"  PASS  {count:,} rows")
         else:
@@ -64,9 +152,8 @@ def validate() -> int:
 
     # ── Check 3: Crime date range ──
     _header(3, "Crime date range (expect 2021-current)")
-    if crime.exists():
-        min_yr = _scalar(f"SELECT MIN(year) FROM '{crime}'")
-        max_yr = _scalar(f"SELECT MAX(year) FROM '{crime}'")
+    if "crime" in present:
+        min_yr, max_yr = crime_stats["min_yr"], crime_stats["max_yr"]
         if min_yr and min_yr <= 2021 and max_yr and max_yr >= CURRENT_YEAR - 1:
             print(f"  PASS  {min_yr} - {max_yr}")
         else:
@@ -75,15 +162,8 @@ def validate() -> int:
 
     # ── Check 4: Geographic bounds ──
     _header(4, "Geographic bounds (San Diego county)")
-    if crime.exists():
-        outliers = _scalar(f"""
-            SELECT COUNT(*) FROM '{crime}'
-            WHERE lat IS NOT NULL AND (
-                lat < {SD_LAT_MIN} OR lat > {SD_LAT_MAX}
-                OR lng < {SD_LNG_MIN} OR lng > {SD_LNG_MAX}
-            )
-        """)
-        total_geo = _scalar(f"SELECT COUNT(*) FROM '{crime}' WHERE lat IS NOT NULL")
+    if "crime" in present:
+        outliers, total_geo = crime_stats["outliers"], crime_stats["total_geo"]
         pct = (outliers / total_geo * 100) if total_geo else 0
         if pct < 1:
             print(f"  PASS  {outliers:,} outliers ({pct:.2f}% of geo records)")
@@ -93,10 +173,10 @@ def validate() -> int:
 
     # ── Check 5: NULL rates on critical columns ──
     _header(5, "NULL rates on critical crime columns (<5%)")
-    if crime.exists():
-        total = _scalar(f"SELECT COUNT(*) FROM '{crime}'")
-        for col in ["incident_date", "agency_short", "crime_against", "offense_group"]:
-            nulls = _scalar(f"SELECT COUNT(*) FROM '{crime}' WHERE {col} IS NULL")
+    if "crime" in present:
+        total = crime_stats["total"]
+        for col in _NULL_COLS:
+            nulls = crime_stats[f"null_{col}"]
             pct = (nulls / total * 100) if total else 0
             status = "PASS" if pct < 5 else "WARN"
             if pct >= 5:
@@ -105,11 +185,11 @@ def validate() -> int:
 
     # ── Check 6: Agency distribution (SDPD ~45%) ──
     _header(6, "Agency distribution")
-    if crime.exists():
-        rows = _q(f"""
+    if "crime" in present:
+        rows = _q("""
             SELECT agency_short, COUNT(*) AS n,
                    ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 1) AS pct
-            FROM '{crime}'
+            FROM crime
             GROUP BY agency_short
             ORDER BY n DESC
             LIMIT 5
@@ -119,9 +199,9 @@ def validate() -> int:
 
     # ── Check 7: Crime category presence ──
     _header(7, "Crime categories present")
-    if crime.exists():
-        cats = _q(f"SELECT DISTINCT crime_against FROM '{crime}' WHERE crime_against IS NOT NULL ORDER BY 1")
-        cats_list = [r[0] for r in cats]
+    if "crime" in present:
+        # A handful of values: sorting them for display is cheaper in Python
+        cats_list = sorted(crime_stats["categories"] or [])
         expected = {"People", "Property", "Society"}
         if expected.issubset(set(cats_list)):
             print(f"  PASS  {cats_list}")
@@ -131,15 +211,9 @@ def validate() -> int:
 
     # ── Check 8: Year-over-year anomalies (>50% change) ──
     _header(8, "Year-over-year crime volume anomalies")
-    if crime.exists():
-        rows = _q(f"""
-            SELECT year, COUNT(*) AS n FROM '{crime}'
-            WHERE year IS NOT NULL
-            GROUP BY year ORDER BY year
-        """)
-        for i in range(1, len(rows)):
-            prev_yr, prev_n = rows[i - 1]
-            curr_yr, curr_n = rows[i]
+    if "crime" in present:
+        rows = sorted((crime_stats["per_year"] or {}).items())
+        for (prev_yr, prev_n), (curr_yr, curr_n) in pairwise(rows):
             change = (curr_n - prev_n) / prev_n * 100 if prev_n else 0
             status = "WARN" if abs(change) > 50 else "PASS"
             if abs(change) > 50:
@@ -148,45 +222,48 @@ def validate() -> int:
 
     # ── Check 9: Crime dedup check ──
     _header(9, "Crime deduplication")
-    if crime.exists():
-        dupes = _scalar(f"""
-            SELECT COUNT(*) FROM (
-                SELECT incidentuid, offense_description
-                FROM '{crime}'
-                GROUP BY incidentuid, offense_description
-                HAVING COUNT(*) > 1
-            )
-        """)
+    if "crime" in present:
+        dupes = 0
+        if crime_stats["total"] > crime_stats["distinct_keys"]:
+            # Hash GROUP BY beats a ROW_NUMBER() ... QUALIFY here: the window
+            # has to partition every row before it can flag any group
+            dupes = _scalar("""
+                SELECT COUNT(*) FROM (
+                    SELECT incidentuid, offense_description
+                    FROM crime
+                    GROUP BY incidentuid, offense_description
+                    HAVING COUNT(*) > 1
+                )
+            """)
         if dupes == 0:
-            print(f"  PASS  No duplicates on (incidentuid, offense_description)")
+            print("  PASS  No duplicates on (incidentuid, offense_description)")
         else:
             print(f"  FAIL  {dupes:,} duplicate groups")
             issues += 1
 
     # ── Check 10: Arrests validation ──
     _header(10, "Arrests row count and offense types")
-    if arrests.exists():
-        count = _scalar(f"SELECT COUNT(*) FROM '{arrests}'")
+    if "arrests" in present:
+        count = arrests_stats["total"]
         status = "PASS" if count and count > 40_000 else "WARN"
         if count and count <= 40_000:
             issues += 1
         print(f"  {status}  {count:,} arrest records")
 
-        types = _q(f"SELECT DISTINCT offense_description FROM '{arrests}' ORDER BY 1")
-        types_list = [r[0] for r in types]
+        # Sorted for display here, NULL last as ORDER BY would put it
+        types_list = sorted(arrests_stats["offense_types"] or [], key=lambda t: (t is None, t))
         print(f"  INFO  Offense types: {types_list}")
 
     # ── Check 11: Arrests date range ──
     _header(11, "Arrests date range")
-    if arrests.exists():
-        min_yr = _scalar(f"SELECT MIN(year) FROM '{arrests}'")
-        max_yr = _scalar(f"SELECT MAX(year) FROM '{arrests}'")
+    if "arrests" in present:
+        min_yr, max_yr = arrests_stats["min_yr"], arrests_stats["max_yr"]
         print(f"  INFO  {min_yr} - {max_yr}")
 
     # ── Check 12: CFS row count ──
     _header(12, "CFS row count (expect >3M)")
-    if cfs.exists():
-        count = _scalar(f"SELECT COUNT(*) FROM '{cfs}'")
+    if "cfs" in present:
+        count = cfs_stats["total"]
         if count and count > 3_000_000:
             print(f"  PASS  {count:,} calls")
         else:
@@ -195,11 +272,9 @@ def validate() -> int:
 
     # ── Check 13: CFS date range and year coverage ──
     _header(13, "CFS date range (expect 2015-current)")
-    if cfs.exists():
-        min_yr = _scalar(f"SELECT MIN(year) FROM '{cfs}'")
-        max_yr = _scalar(f"SELECT MAX(year) FROM '{cfs}'")
-        years = _q(f"SELECT DISTINCT year FROM '{cfs}' WHERE year IS NOT NULL ORDER BY 1")
-        years_list = [r[0] for r in years]
+    if "cfs" in present:
+        min_yr, max_yr = cfs_stats["min_yr"], cfs_stats["max_yr"]
+        years_list = sorted(cfs_stats["years"] or [])
         if min_yr and min_yr <= 2015 and max_yr and max_yr >= CURRENT_YEAR - 1:
             print(f"  PASS  {min_yr} - {max_yr}")
         else:
@@ -209,8 +284,11 @@ def validate() -> int:
 
     # ── Check 14: CFS beat coverage ──
     _header(14, "CFS beat coverage")
-    if cfs.exists():
-        beat_count = _scalar(f"SELECT COUNT(DISTINCT beat) FROM '{cfs}' WHERE beat IS NOT NULL")
+    if "cfs" in present:
+        # Exact on purpose: with ~130 beats the hash set is tiny, while
+        # approx_count_distinct is off by ~10% at this cardinality and would
+        # hide a few missing beats
+        beat_count = cfs_stats["beats"]
         print(f"  INFO  {beat_count} distinct beats")
 
     # ── Check 15: Aggregation files ──
@@ -218,27 +296,35 @@ def validate() -> int:
     expected_aggs = [
         "crime_overview_monthly", "crime_by_type", "crime_by_zip",
         "crime_by_agency", "victim_demographics", "domestic_violence",
-        "temporal_patterns", "map_points", "yearly_summary", "crime_by_city",
+        "temporal_patterns", "map_points", "map_grid", "yearly_summary", "crime_by_city",
         "arrests_by_type",
         "cfs_monthly", "cfs_by_beat", "cfs_temporal",
+        "cfs_monthly_priority", "cfs_beat_priority",
     ]
+    agg_sizes = _file_sizes(AGGREGATED_DIR)
+    found_aggs = [name for name in expected_aggs if f"{name}.parquet" in agg_sizes]
+    # Every file's row count from one footer-only query; a glob read_parquet
+    # with filename=true was slower than this, since it still streams rows.
+    # pyarrow's read_metadata is quicker per file, but importing
+    # pyarrow.parquet alone takes ~100 ms, longer than this whole check
+    files = [str(AGGREGATED_DIR / f"{name}.parquet") for name in found_aggs]
+    counts = {
+        Path(file_name).stem: num_rows
+        for file_name, num_rows in _q("SELECT file_name, num_rows FROM parquet_file_metadata(?)", [files])
+    } if found_aggs else {}
     for name in expected_aggs:
-        path = AGGREGATED_DIR / f"{name}.parquet"
-        if path.exists():
-            count = _scalar(f"SELECT COUNT(*) FROM '{path}'")
-            size_mb = path.stat().st_size / (1 << 20)
+        if name in counts:
+            count = counts[name]
+            size_mb = agg_sizes[f"{name}.parquet"] / (1 << 20)
             print(f"  PASS  {name}: {count:,} rows ({size_mb:.1f} MB)")
         else:
             print(f"  FAIL  {name}: NOT FOUND")
             issues += 1
 
     # ── Summary ──
-    print(f"\n{'=' * 64}")
-    if issues == 0:
-        print("  All checks passed!")
-    else:
-        print(f"  {issues} issue(s) found")
-    print(f"{'=' * 64}")
+    rule = "=" * 64
+    result = "All checks passed!" if issues == 0 else f"{issues} issue(s) found"
+    print(f"\n{rule}\n  {result}\n{rule}")
 
     return issues
 